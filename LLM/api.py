@@ -1,12 +1,39 @@
 from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import json
+import shutil
 import tempfile
+import uuid
 import os
-from main import main as run_pipeline
+from concurrent.futures import ThreadPoolExecutor
+from main import PIPELINE_STAGES, main as run_pipeline, stream as stream_pipeline
+from jobs import JobStore
+import metrics
+from warmup import WARM_UP_ON_STARTUP, WarmUp
+from embedding import chroma_sink
+from extraction.text_extraction import shutdown_pool as shutdown_text_extraction_pool
 # import sys
 # sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# The pipeline is synchronous and long-running; it runs on its own executor so the event loop stays free
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+PIPELINE_QUEUE_DEPTH = int(os.getenv("PIPELINE_QUEUE_DEPTH", "8"))
+
+# Uploads are streamed to disk in chunks; oversized or unsupported files are rejected early
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_FILE_BYTES = int(float(os.getenv("UPLOAD_MAX_FILE_MB", "10")) * 1024 * 1024)
+UPLOAD_MAX_REQUEST_BYTES = int(float(os.getenv("UPLOAD_MAX_REQUEST_MB", "200")) * 1024 * 1024)
+RESUME_EXTENSIONS = (".pdf", ".docx")
+JD_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+pending_runs = 0
+
+job_store = JobStore(stages=PIPELINE_STAGES)
+warm_up = WarmUp()
+
 app = FastAPI()
 
 app.add_middleware(
@@ -17,32 +44,290 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_warm_up():
+    # Pay the model load, LLM client creation and Chroma import once per worker instead of on the first upload
+    if WARM_UP_ON_STARTUP:
+        warm_up.start()
+    else:
+        warm_up.skip()
+
+@app.on_event("shutdown")
+def stop_pipeline_executor():
+    pipeline_executor.shutdown(wait=False, cancel_futures=True)
+    # Requests do not wait for their Chroma writes; make sure the queued ones land before exiting
+    chroma_sink.flush()
+    shutdown_text_extraction_pool()
+
+class PipelineBusyError(Exception):
+    pass
+
+def pipeline_has_capacity():
+    # Running pipelines plus those waiting for a worker
+    return pending_runs < PIPELINE_WORKERS + PIPELINE_QUEUE_DEPTH
+
+def submit_to_pipeline(func, *args):
+    """Queue `func` on the pipeline executor and return an awaitable future."""
+    global pending_runs
+    if not pipeline_has_capacity():
+        raise PipelineBusyError("Pipeline queue is full, retry later")
+
+    pending_runs += 1
+    future = asyncio.get_running_loop().run_in_executor(pipeline_executor, func, *args)
+
+    def release(_):
+        global pending_runs
+        pending_runs -= 1
+
+    future.add_done_callback(release)
+    return future
+
+def busy_response(message="Pipeline queue is full, retry later"):
+    return JSONResponse(
+        content={"status": "error", "message": message},
+        status_code=503,
+        headers={"Retry-After": "30"}
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pending_runs": pending_runs}
+
+@app.get("/ready")
+async def ready():
+    # Readiness for the load balancer: 503 until every warm-up step is done (see warmup.WarmUp)
+    status = warm_up.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition of the process-wide counters and histograms
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/reports/{run_id}")
+async def get_run_report(run_id: str):
+    if not metrics.METRICS_REPORT_DIR or not all(c.isalnum() for c in run_id):
+        return JSONResponse(content={"status": "error", "message": "Report not found"}, status_code=404)
+    try:
+        with open(os.path.join(metrics.METRICS_REPORT_DIR, f"{run_id}.json"), "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        return JSONResponse(content={"status": "error", "message": "Report not found"}, status_code=404)
+    return JSONResponse(content=report, status_code=200)
+
+class UploadRejectedError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def upload_rejected_response(e):
+    return JSONResponse(content={"status": "error", "message": str(e)}, status_code=e.status_code)
+
+def check_upload(upload, allowed_extensions):
+    filename = os.path.basename(upload.filename or "")
+    if not filename.lower().endswith(allowed_extensions):
+        raise UploadRejectedError(
+            f"Unsupported file type: '{filename}' (allowed: {', '.join(allowed_extensions)})", 415
+        )
+    # The multipart parser already knows the size of spooled uploads; reject before copying anything
+    size = getattr(upload, "size", None)
+    if size is not None and size > UPLOAD_MAX_FILE_BYTES:
+        raise UploadRejectedError(f"File too large: '{filename}' exceeds {UPLOAD_MAX_FILE_BYTES} bytes", 413)
+    return filename
+
+async def stream_upload(upload, dest_path, remaining_bytes):
+    """Copy an upload to disk chunk by chunk; returns the number of bytes written."""
+    written = 0
+    with open(dest_path, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > UPLOAD_MAX_FILE_BYTES:
+                raise UploadRejectedError(
+                    f"File too large: '{os.path.basename(dest_path)}' exceeds {UPLOAD_MAX_FILE_BYTES} bytes", 413
+                )
+            if written > remaining_bytes:
+                raise UploadRejectedError(f"Request too large: uploads exceed {UPLOAD_MAX_REQUEST_BYTES} bytes", 413)
+            f.write(chunk)
+    return written
+
+async def save_uploads(jd, resumes):
+    jd_name = check_upload(jd, JD_EXTENSIONS)
+    resume_names = [check_upload(resume, RESUME_EXTENSIONS) for resume in resumes]
+
+    known_sizes = [u.size for u in [jd, *resumes] if getattr(u, "size", None) is not None]
+    if sum(known_sizes) > UPLOAD_MAX_REQUEST_BYTES:
+        raise UploadRejectedError(f"Request too large: uploads exceed {UPLOAD_MAX_REQUEST_BYTES} bytes", 413)
+
+    temp_dir = tempfile.mkdtemp()
+    resume_folder = os.path.join(temp_dir, "resumes")
+    jd_folder = os.path.join(temp_dir, "jd")
+
+    os.makedirs(resume_folder, exist_ok=True)
+    os.makedirs(jd_folder, exist_ok=True)
+
+    try:
+        remaining = UPLOAD_MAX_REQUEST_BYTES
+        remaining -= await stream_upload(jd, os.path.join(jd_folder, jd_name), remaining)
+
+        for resume, resume_name in zip(resumes, resume_names):
+            remaining -= await stream_upload(resume, os.path.join(resume_folder, resume_name), remaining)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    return resume_folder, jd_folder
+
+def discard_uploads(resume_folder):
+    # Uploads of a request that never reached the pipeline
+    shutil.rmtree(os.path.dirname(resume_folder), ignore_errors=True)
+
 @app.post("/run-pipeline")
 async def trigger_pipeline_from_uploads(
     jd: UploadFile = File(...),
     resumes: list[UploadFile] = File(...)
 ):
+    if not pipeline_has_capacity():
+        return busy_response()
+
     try:
-        temp_dir = tempfile.mkdtemp()
-        resume_folder = os.path.join(temp_dir, "resumes")
-        jd_folder = os.path.join(temp_dir, "jd")
+        resume_folder, jd_folder = await save_uploads(jd, resumes)
+
+        run_id = uuid.uuid4().hex
+        try:
+            future = submit_to_pipeline(lambda: run_pipeline(resume_folder, jd_folder, run_id=run_id, flush_chroma=False))
+        except PipelineBusyError:
+            discard_uploads(resume_folder)
+            raise
+        results = await future
+
+        return JSONResponse(content={"status": "success", "run_id": run_id, "results": results}, status_code=200)
+
+    except UploadRejectedError as e:
+        return upload_rejected_response(e)
+    except PipelineBusyError as e:
+        return busy_response(str(e))
+    except Exception as e:
+        print("[ERROR] Pipeline failed:", e)
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+def start_stream(resume_folder, jd_folder):
+    """Start the streaming pipeline on the pipeline executor; raises PipelineBusyError when it is full.
 
-        os.makedirs(resume_folder, exist_ok=True)
-        os.makedirs(jd_folder, exist_ok=True)
+    Returns the NDJSON line generator relaying its results.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    run_id = uuid.uuid4().hex
 
-        jd_path = os.path.join(jd_folder, jd.filename)
-        with open(jd_path, "wb") as f:
-            f.write(await jd.read())
+    def produce():
+        try:
+            for result in stream_pipeline(resume_folder, jd_folder, run_id=run_id, flush_chroma=False):
+                loop.call_soon_threadsafe(queue.put_nowait, {"type": "result", "result": result})
+        except Exception as e:
+            print("[ERROR] Streaming pipeline failed:", e)
+            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": str(e)})
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
 
-        for resume in resumes:
-            resume_path = os.path.join(resume_folder, resume.filename)
-            with open(resume_path, "wb") as f:
-                f.write(await resume.read())
+    submit_to_pipeline(produce)
 
-        results = run_pipeline(resume_folder, jd_folder)
+    async def relay():
+        count = 0
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            if item["type"] == "result":
+                count += 1
+            yield json.dumps(item) + "\n"
+        yield json.dumps({"type": "done", "count": count, "run_id": run_id}) + "\n"
 
-        return JSONResponse(content={"status": "success", "results": results}, status_code=200)
+    return relay()
 
+@app.post("/run-pipeline/stream")
+async def stream_pipeline_from_uploads(
+    jd: UploadFile = File(...),
+    resumes: list[UploadFile] = File(...)
+):
+    if not pipeline_has_capacity():
+        return busy_response()
+
+    try:
+        resume_folder, jd_folder = await save_uploads(jd, resumes)
+        # Submitted before the response starts, so a full queue is still a 503 rather than an error line
+        try:
+            lines = start_stream(resume_folder, jd_folder)
+        except PipelineBusyError as e:
+            discard_uploads(resume_folder)
+            return busy_response(str(e))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    except UploadRejectedError as e:
+        return upload_rejected_response(e)
     except Exception as e:
         print("[ERROR] Pipeline failed:", e)
-        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+def run_job(job_id, resume_folder, jd_folder):
+    job_store.start(job_id)
+    try:
+        # The job id doubles as the run id, so the run report is at /reports/<job_id>
+        results = run_pipeline(
+            resume_folder,
+            jd_folder,
+            progress=lambda stage, status, elapsed: job_store.update_stage(job_id, stage, status, elapsed),
+            run_id=job_id,
+            flush_chroma=False
+        )
+        job_store.complete(job_id, results)
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} failed:", e)
+        job_store.fail(job_id, e)
+
+@app.post("/jobs")
+async def submit_job(
+    jd: UploadFile = File(...),
+    resumes: list[UploadFile] = File(...)
+):
+    if not pipeline_has_capacity():
+        return busy_response()
+
+    try:
+        resume_folder, jd_folder = await save_uploads(jd, resumes)
+        if not pipeline_has_capacity():
+            discard_uploads(resume_folder)
+            return busy_response()
+        job = job_store.create(jd=jd.filename, resume_count=len(resumes))
+        submit_to_pipeline(run_job, job["job_id"], resume_folder, jd_folder)
+        return JSONResponse(content={"status": "accepted", "job_id": job["job_id"]}, status_code=202)
+
+    except UploadRejectedError as e:
+        return upload_rejected_response(e)
+    except PipelineBusyError as e:
+        return busy_response(str(e))
+    except Exception as e:
+        print("[ERROR] Job submission failed:", e)
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse(content={"status": "error", "message": "Job not found"}, status_code=404)
+    return JSONResponse(content=job, status_code=200)
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse(content={"status": "error", "message": "Job not found"}, status_code=404)
+    if job["status"] == "failed":
+        return JSONResponse(content={"status": "error", "message": job["error"]}, status_code=500)
+    if job["status"] != "completed":
+        return JSONResponse(content={"status": job["status"], "job_id": job_id}, status_code=202)
+
+    results = job_store.get_results(job_id)
+    return JSONResponse(content={"status": "success", "results": results}, status_code=200)
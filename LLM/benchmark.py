@@ -0,0 +1,554 @@
+"""End-to-end benchmark for the shortlisting pipeline.
+
+Generates synthetic resume/JD corpora (PDF, DOCX, TXT of various sizes), runs each
+stage against a mock LLM with configurable latency and reports throughput,
+p50/p95 latency and peak RSS per corpus size. Each corpus size runs in its own
+subprocess, so its peak RSS is not inflated by the sizes before it.
+
+    python benchmark.py --sizes 10,50,200 --jds 2 --llm-latency 0.5 --output report.json
+    python benchmark.py --sizes 10,50 --baseline report.json   # exits 1 on a regression
+"""
+import os
+import io
+import re
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import resource
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from inference import make_response, use_backend
+
+SKILLS = [
+    "Python", "SQL", "Docker", "Kubernetes", "AWS", "Azure", "TensorFlow", "PyTorch", "Pandas", "NumPy",
+    "Spark", "Airflow", "FastAPI", "Django", "React", "Java", "Scala", "Go", "Terraform", "Git",
+    "LangChain", "Tableau", "Power BI", "Snowflake", "Kafka", "Redis", "PostgreSQL", "MongoDB",
+]
+ROLES = ["Data Scientist", "ML Engineer", "Backend Engineer", "Data Engineer", "Software Engineer", "Analyst"]
+DEGREES = [
+    "B.Tech in Computer Science", "M.Tech in Data Science", "BSc in Mathematics",
+    "MSc in Statistics", "MBA in Analytics", "PhD in Machine Learning",
+]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Soylent"]
+FILLER = [
+    "Worked closely with product and design to ship features on schedule",
+    "Mentored junior engineers and ran weekly code reviews",
+    "Reduced infrastructure cost by consolidating batch workloads",
+    "Wrote design documents and presented them to stakeholders",
+    "Improved test coverage and release reliability across services",
+]
+# Number of experience entries per synthetic document size
+DOC_SIZES = {"small": 3, "medium": 12, "large": 40}
+RESUME_FORMATS = [".pdf", ".docx"]
+JD_FORMATS = [".pdf", ".docx", ".txt"]
+
+STAGES = ["text_extraction", "llm_extraction", "embedding", "chroma_write", "comparison", "end_to_end"]
+
+# Corpus generation
+
+def make_resume_lines(rng, size):
+    lines = [f"ROLE: {rng.choice(ROLES)}.", f"SKILLS: {', '.join(rng.sample(SKILLS, rng.randint(4, 10)))}."]
+    lines += [f"EDUCATION: {degree}." for degree in rng.sample(DEGREES, 2)]
+    for _ in range(DOC_SIZES[size]):
+        lines.append(
+            f"{rng.choice(ROLES)} at {rng.choice(COMPANIES)} for {rng.randint(1, 6)} years, "
+            f"built systems with {', '.join(rng.sample(SKILLS, 3))}. {rng.choice(FILLER)}."
+        )
+    lines.append("OTHER: Certified Scrum Master. Fluent in English.")
+    return lines
+
+def make_jd_lines(rng, size):
+    lines = [f"ROLE: {rng.choice(ROLES)}.", f"SKILLS: {', '.join(rng.sample(SKILLS, rng.randint(4, 8)))}."]
+    lines.append(f"EDUCATION: {rng.choice(DEGREES)}.")
+    for _ in range(max(2, DOC_SIZES[size] // 3)):
+        lines.append(f"Expected to work with {', '.join(rng.sample(SKILLS, 3))} at {rng.randint(2, 8)} years level. {rng.choice(FILLER)}.")
+    return lines
+
+def write_pdf(path, lines, lines_per_page=60, width=95):
+    import fitz
+    wrapped = []
+    for line in lines:
+        wrapped += [line[i:i + width] for i in range(0, len(line), width)] or [""]
+    doc = fitz.open()
+    for start in range(0, len(wrapped), lines_per_page):
+        page = doc.new_page()
+        page.insert_text((40, 50), "\n".join(wrapped[start:start + lines_per_page]), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def write_docx(path, lines):
+    from docx import Document
+    doc = Document()
+    for line in lines:
+        doc.add_paragraph(line)
+    doc.save(path)
+
+def write_txt(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+WRITERS = {".pdf": write_pdf, ".docx": write_docx, ".txt": write_txt}
+
+def generate_corpus(root, resume_count, jd_count, seed=0):
+    """Write `resume_count` resumes and `jd_count` JDs into root/resumes and root/jd, cycling formats and sizes."""
+    rng = random.Random(seed)
+    resume_folder = os.path.join(root, "resumes")
+    jd_folder = os.path.join(root, "jd")
+    os.makedirs(resume_folder, exist_ok=True)
+    os.makedirs(jd_folder, exist_ok=True)
+    sizes = list(DOC_SIZES)
+
+    for i in range(resume_count):
+        ext = RESUME_FORMATS[i % len(RESUME_FORMATS)]
+        size = sizes[i % len(sizes)]
+        WRITERS[ext](os.path.join(resume_folder, f"resume_{i:04d}_{size}{ext}"), make_resume_lines(rng, size))
+    for i in range(jd_count):
+        ext = JD_FORMATS[i % len(JD_FORMATS)]
+        size = sizes[i % len(sizes)]
+        WRITERS[ext](os.path.join(jd_folder, f"jd_{i:03d}_{size}{ext}"), make_jd_lines(rng, size))
+    return resume_folder, jd_folder
+
+# Mock LLM
+
+def find_terms(text, vocabulary):
+    return [term for term in vocabulary if re.search(rf"(?<!\w){re.escape(term)}(?!\w)", text)]
+
+def mock_fields(text):
+    sentences = [s.strip() for s in re.split(r"\.\s+", text) if s.strip()]
+    return {
+        "skill": find_terms(text, SKILLS),
+        "education": find_terms(text, DEGREES),
+        "experience": [s for s in sentences if " at " in s][:20],
+        "job role": find_terms(text, ROLES)[:1],
+        "other information": [s for s in sentences if s.startswith("OTHER")],
+    }
+
+def mock_comparison(jd_text, resume_text):
+    jd_skills = set(find_terms(jd_text, SKILLS))
+    resume_skills = set(find_terms(resume_text, SKILLS))
+    skill_pct = round(100.0 * len(jd_skills & resume_skills) / max(1, len(jd_skills)), 1)
+    role_pct = 100.0 if set(find_terms(jd_text, ROLES)) & set(find_terms(resume_text, ROLES)) else 40.0
+
+    def field(pct):
+        return {"match_pct": pct, "resume_value": "", "job_description_value": "", "explanation": "Synthetic score."}
+
+    return {
+        "Skills": field(skill_pct),
+        "Education": field(80.0),
+        "Job Role": field(role_pct),
+        "Experience": field(75.0),
+        "OverallMatchPercentage": round(0.35 * skill_pct + 0.3 * 75.0 + 0.2 * 80.0 + 0.15 * role_pct, 1),
+        "why_overall_match_is_this": "Synthetic benchmark response.",
+        "AI_Generated_Estimate_Percentage": 0.0,
+    }
+
+class MockLLMBackend:
+    """Answers the extraction and comparison prompts deterministically after a simulated latency."""
+
+    def __init__(self, latency=0.2, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    def respond(self, system, user):
+        if "### RESUME " in user:
+            parts = re.split(r"### RESUME (\S+)\n", user)[1:]
+            return {batch_id: mock_fields(text) for batch_id, text in zip(parts[::2], parts[1::2])}
+        if "resume parser" in system or "job description parser" in system:
+            return mock_fields(user)
+        if "### Resume: " in user:
+            jd_text = user.split("\n\nJob Description:\n", 1)[1].split("\n\n### Resume: ", 1)[0]
+            blocks = user.split("\n\n### Resume: ")[1:]
+            return {block.split("\n", 1)[0]: mock_comparison(jd_text, block) for block in blocks}
+        name = re.search(r'\{\s*"([^"]+)":\s*\{', user).group(1)
+        jd_text, resume_text = user.split("\n\nJob Description:\n", 1)[1].split("\n\nResume:\n", 1)
+        return {name: mock_comparison(jd_text, resume_text)}
+
+    def chat_completion(self, messages, **params):
+        content = json.dumps(self.respond(messages[0]["content"], messages[-1]["content"]))
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return make_response(content)
+
+# Measurement
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS; children covers the text extraction process pool.
+    # Both are high-water marks of the whole process, hence one subprocess per corpus size.
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own / 2 ** 20, 1), round(children / 2 ** 20, 1)
+
+def current_rss_mb():
+    """Resident set size right now (Linux only; None elsewhere)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+@contextlib.contextmanager
+def sample_rss(interval=0.01):
+    """Track the peak RSS while the block runs; the result is in peak["mb"] afterwards (None if unsupported)."""
+    peak = {"mb": current_rss_mb()}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            rss = current_rss_mb()
+            if rss is not None and (peak["mb"] is None or rss > peak["mb"]):
+                peak["mb"] = rss
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        yield peak
+    finally:
+        done.set()
+        thread.join()
+        rss = current_rss_mb()
+        if rss is not None and peak["mb"] is not None:
+            peak["mb"] = round(max(peak["mb"], rss), 1)
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+@contextlib.contextmanager
+def quiet(enabled):
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def summarize(latencies, errors, wall, rss):
+    return {
+        "items": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_per_s": round(len(latencies) / wall, 3) if wall > 0 else None,
+        "p50_s": round(percentile(latencies, 50), 4) if latencies else None,
+        "p95_s": round(percentile(latencies, 95), 4) if latencies else None,
+        "peak_rss_mb": rss,
+    }
+
+def run_stage(name, items, func, workers=1, verbose=False):
+    """Call func(item) for every item, timing each call; returns the stage summary and the results."""
+    latencies = []
+    errors = 0
+
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            return func(item)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    results = []
+    start = time.perf_counter()
+    with quiet(not verbose), sample_rss() as rss:
+        if workers <= 1:
+            for item in items:
+                try:
+                    results.append(timed(item))
+                except Exception as e:
+                    errors += 1
+                    print(f"[ERROR] {name} failed: {e}", file=sys.stderr)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(timed, item) for item in items]:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        errors += 1
+                        print(f"[ERROR] {name} failed: {e}", file=sys.stderr)
+    wall = time.perf_counter() - start
+    return summarize(latencies, errors, wall, rss["mb"]), results
+
+def run_bulk_stage(name, func, metrics, verbose=False):
+    """Run func() once over the whole corpus, the way the pipeline does (process pool, batches, bulk encode).
+
+    Per-document latencies come from the metrics.record_document events of stage `name`.
+    """
+    start = time.perf_counter()
+    with quiet(not verbose), sample_rss() as rss, metrics.run_report(report_dir="") as report:
+        results = func()
+    wall = time.perf_counter() - start
+    events = [event for event in report.documents if event["stage"] == name]
+    errors = sum(1 for event in events if event["status"] == "failed")
+    return summarize([event["elapsed"] for event in events], errors, wall, rss["mb"]), results
+
+def load_pipeline(args):
+    """Import the pipeline after the environment is configured; module-level settings read it on import."""
+    if not args.with_caches:
+        os.environ["EXTRACTION_CACHE_ENABLED"] = "0"
+        os.environ["COMPARISON_CACHE_ENABLED"] = "0"
+    os.environ["PIPELINE_INCREMENTAL"] = "0"
+
+    use_backend(MockLLMBackend(args.llm_latency, args.llm_jitter, args.seed))
+
+    from extraction.text_extraction import iter_extracted_texts
+    from extraction.resume_extraction import LLMResumeParser
+    from extraction.jd_extraction import LLMJDParser
+    from embedding import resume_embedding, jd_embedding
+    from embedding.model_registry import get_embedder
+    from compare import llm
+    import main as pipeline
+    import metrics
+    return {
+        "iter_extracted_texts": iter_extracted_texts,
+        "resume_parser": LLMResumeParser(),
+        "jd_parser": LLMJDParser(),
+        "resume_embedding": resume_embedding,
+        "jd_embedding": jd_embedding,
+        "get_embedder": get_embedder,
+        "llm": llm,
+        "pipeline": pipeline,
+        "metrics": metrics,
+    }
+
+def benchmark_size(p, root, resume_count, args):
+    """Run every stage over a fresh corpus of `resume_count` resumes; returns {stage: summary}."""
+    resume_folder, jd_folder = generate_corpus(os.path.join(root, "corpus"), resume_count, args.jds, args.seed)
+    documents = [("resume", os.path.join(resume_folder, f)) for f in sorted(os.listdir(resume_folder))]
+    documents += [("jd", os.path.join(jd_folder, f)) for f in sorted(os.listdir(jd_folder))]
+    kinds = {path: kind for kind, path in documents}
+    metrics = p["metrics"]
+    stages = {}
+
+    stages["text_extraction"], texts = run_bulk_stage(
+        "text_extraction", lambda: dict(p["iter_extracted_texts"](list(kinds))), metrics, verbose=args.verbose
+    )
+
+    def extract_all():
+        records = {"resume": {}, "jd": {}}
+
+        def record(kind, path, parsed, elapsed, batch=1):
+            ok = bool(parsed) and any(parsed.values())
+            metrics.record_document("llm_extraction", path, elapsed, "ok" if ok else "failed", batch=batch)
+            if ok:
+                records[kind][path] = parsed
+
+        # Resumes go through extract_fields_batch like process_resumes, each charged its share of the batch
+        resume_items = [(path, text) for path, text in texts.items() if kinds[path] == "resume" and text.strip()]
+        batch_size = max(1, args.extraction_batch_size)
+        for start in range(0, len(resume_items), batch_size):
+            batch = dict(resume_items[start:start + batch_size])
+            began = time.perf_counter()
+            results = p["resume_parser"].extract_fields_batch(batch)
+            elapsed = (time.perf_counter() - began) / len(batch)
+            for path, parsed in results.items():
+                record("resume", path, parsed, elapsed, batch=len(batch))
+
+        for path, text in texts.items():
+            if kinds[path] == "jd" and text.strip():
+                began = time.perf_counter()
+                record("jd", path, p["jd_parser"].extract_fields(text), time.perf_counter() - began)
+        return records
+
+    stages["llm_extraction"], records = run_bulk_stage("llm_extraction", extract_all, metrics, verbose=args.verbose)
+
+    embedding_modules = {"resume": p["resume_embedding"], "jd": p["jd_embedding"]}
+    chroma_dirs = {"resume": os.path.join(root, "chroma_resume"), "jd": os.path.join(root, "chroma_jd")}
+
+    # Bulk encode of every field per kind, as in a pipeline run; Chroma is timed separately below
+    stages["embedding"], embedded = run_bulk_stage(
+        "embedding",
+        lambda: {kind: embedding_modules[kind].embed_records(records[kind], chroma_dirs[kind], persist="off")
+                 for kind in records},
+        metrics, verbose=args.verbose
+    )
+
+    def write_all():
+        for kind, (field_texts, embeddings, metadatas) in embedded.items():
+            doc_ids = sorted(set(m["doc_id"] for m in metadatas))
+            if not doc_ids:
+                continue
+            began = time.perf_counter()
+            embedding_modules[kind].write_records(chroma_dirs[kind], set(doc_ids), field_texts, embeddings, metadatas)
+            elapsed = (time.perf_counter() - began) / len(doc_ids)
+            for doc_id in doc_ids:
+                metrics.record_document("chroma_write", doc_id, elapsed, bulk=len(doc_ids))
+
+    stages["chroma_write"], _ = run_bulk_stage("chroma_write", write_all, metrics, verbose=args.verbose)
+
+    llm = p["llm"]
+    with quiet(not args.verbose):
+        groups = llm.group_pairs(llm.build_pairs_from_records(embedded["resume"], embedded["jd"]))
+    stages["comparison"], _ = run_stage(
+        "comparison", groups, llm.compare_group, workers=min(llm.LLM_CONCURRENCY, len(groups)) or 1,
+        verbose=args.verbose
+    )
+
+    # The real entry point on a fresh copy, so orchestration and pooling overheads are included;
+    # main.main waits for its background Chroma writes before returning
+    e2e_root = os.path.join(root, "end_to_end")
+    shutil.copytree(os.path.dirname(resume_folder), e2e_root)
+    summary, _ = run_stage(
+        "end_to_end", [e2e_root],
+        lambda path: p["pipeline"].main(os.path.join(path, "resumes"), os.path.join(path, "jd")),
+        verbose=args.verbose
+    )
+    # One run: report documents per second rather than runs per second
+    if summary["wall_s"]:
+        summary["throughput_per_s"] = round(len(documents) / summary["wall_s"], 3)
+    stages["end_to_end"] = summary
+    return stages
+
+def print_report(runs):
+    header = f"{'size':>6}  {'stage':<16}{'items':>7}{'err':>5}{'wall s':>10}{'items/s':>10}{'p50 s':>9}{'p95 s':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for run in runs:
+        for stage in STAGES:
+            s = run["stages"].get(stage)
+            if not s:
+                continue
+            fmt = lambda v, digits=3: "-" if v is None else f"{v:.{digits}f}"
+            print(f"{run['corpus_size']:>6}  {stage:<16}{s['items']:>7}{s['errors']:>5}{s['wall_s']:>10.3f}"
+                  f"{fmt(s['throughput_per_s']):>10}{fmt(s['p50_s']):>9}{fmt(s['p95_s']):>9}{fmt(s['peak_rss_mb'], 1):>9}")
+    print()
+    for run in runs:
+        print(f"{run['corpus_size']:>6}  peak RSS {run['peak_rss_mb']:.1f} MB, text extraction pool "
+              f"{run['peak_children_rss_mb']:.1f} MB, embedding model load {run['embedding_model_load_s']:.3f}s")
+
+def find_regressions(runs, baseline, tolerance):
+    """Stages whose throughput dropped, or whose p95 latency grew, by more than `tolerance` vs the baseline."""
+    previous = {(run["corpus_size"], stage): s for run in baseline.get("runs", []) for stage, s in run["stages"].items()}
+    regressions = []
+    for run in runs:
+        for stage, s in run["stages"].items():
+            old = previous.get((run["corpus_size"], stage))
+            if not old:
+                continue
+            if old.get("throughput_per_s") and s["throughput_per_s"] is not None \
+                    and s["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+                regressions.append(f"{stage}@{run['corpus_size']}: throughput {old['throughput_per_s']} -> {s['throughput_per_s']}/s")
+            if old.get("p95_s") and s["p95_s"] is not None and s["p95_s"] > old["p95_s"] * (1 + tolerance):
+                regressions.append(f"{stage}@{run['corpus_size']}: p95 {old['p95_s']} -> {s['p95_s']}s")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resume shortlisting pipeline against a mock LLM.")
+    parser.add_argument("--sizes", default="10,50", help="Comma-separated resume counts to benchmark")
+    parser.add_argument("--jds", type=int, default=2, help="Job descriptions per corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Mock LLM latency per request, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="Uniform +/- jitter on the mock latency, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-caches", action="store_true", help="Keep the extraction/comparison caches enabled")
+    parser.add_argument("--extraction-batch-size", type=int, default=int(os.getenv("EXTRACTION_BATCH_SIZE", "1")),
+                        help="Resumes per extraction request in the llm_extraction stage (default: EXTRACTION_BATCH_SIZE)")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown vs the baseline")
+    parser.add_argument("--workdir", help="Directory for corpora and Chroma stores (default: a temp dir, removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp dir with the generated corpora")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    # Internal: one corpus size, run by the parent in a subprocess
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--size-root", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def run_single_size(args):
+    """Subprocess body: benchmark one corpus size and write its run entry to --result-file."""
+    p = load_pipeline(args)
+    with quiet(not args.verbose):
+        start = time.perf_counter()
+        p["get_embedder"]()
+        model_load_s = round(time.perf_counter() - start, 3)
+
+    stages = benchmark_size(p, args.size_root, args.single_size, args)
+    rss, children_rss = peak_rss_mb()
+    run = {
+        "corpus_size": args.single_size,
+        "jd_count": args.jds,
+        "embedding_model_load_s": model_load_s,
+        "peak_rss_mb": rss,
+        "peak_children_rss_mb": children_rss,
+        "stages": stages,
+    }
+    with open(args.result_file, "w", encoding="utf-8") as f:
+        json.dump(run, f)
+
+def run_size_subprocess(size, root, args):
+    result_file = os.path.join(root, "result.json")
+    os.makedirs(root, exist_ok=True)
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--single-size", str(size), "--size-root", root, "--result-file", result_file,
+        "--jds", str(args.jds), "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter),
+        "--seed", str(args.seed), "--extraction-batch-size", str(args.extraction_batch_size),
+    ]
+    if args.with_caches:
+        command.append("--with-caches")
+    if args.verbose:
+        command.append("--verbose")
+    completed = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark of corpus size {size} exited with status {completed.returncode}")
+    with open(result_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.single_size is not None:
+        run_single_size(args)
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="shortlister_bench_")
+    # Only a temp dir we created ourselves is removed afterwards
+    cleanup = not args.keep and not args.workdir
+    runs = []
+    try:
+        for size in sizes:
+            print(f"[BENCH] Corpus of {size} resume(s) and {args.jds} JD(s)...", file=sys.stderr)
+            runs.append(run_size_subprocess(size, os.path.join(workdir, f"size_{size}"), args))
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "jds": args.jds,
+            "extraction_batch_size": args.extraction_batch_size,
+            "with_caches": args.with_caches,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+    print_report(runs)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[BENCH] Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(runs, json.load(f), args.tolerance)
+        if regressions:
+            print("\n[BENCH] Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n[BENCH] No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
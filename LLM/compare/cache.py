@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+COMPARISON_CACHE_ENABLED = os.getenv("COMPARISON_CACHE_ENABLED", "1") != "0"
+COMPARISON_CACHE_PATH = os.getenv(
+    "COMPARISON_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "resume_shortlister", "comparisons.sqlite3")
+)
+
+def make_comparison_key(resume_fields, jd_fields, model_name, *prompts):
+    """Stable key over the resume field texts, JD field texts, model and prompt templates."""
+    h = hashlib.sha256()
+    for part in (resume_fields, jd_fields, model_name or "", *prompts):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ComparisonCache:
+    """SQLite store of parsed comparison results, safe to share between worker threads."""
+
+    def __init__(self, path=COMPARISON_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS comparisons ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT result FROM comparisons WHERE key = ?", (key,)).fetchone()
+            metrics.inc("cache_requests_total", cache="comparison", result="hit" if row else "miss")
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"[WARNING] Comparison cache lookup failed: {e}")
+            metrics.inc("cache_requests_total", cache="comparison", result="error")
+            return None
+
+    def put(self, key, result):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO comparisons (key, result, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), time.time())
+                )
+        except Exception as e:
+            print(f"[WARNING] Comparison cache write failed: {e}")
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Process-wide comparison cache, or None when COMPARISON_CACHE_ENABLED=0."""
+    global _default_cache
+    if not COMPARISON_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = ComparisonCache()
+            except Exception as e:
+                print(f"[WARNING] Comparison cache unavailable: {e}")
+                return None
+    return _default_cache
@@ -2,18 +2,25 @@ import os
 import json
 import re
 import time
-from chromadb import PersistentClient
-from huggingface_hub import InferenceClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from inference import get_inference_client
+import metrics
+from embedding.resume_embedding import COLLECTION_NAME as RESUME_COLLECTION
+from embedding.jd_embedding import COLLECTION_NAME as JD_COLLECTION
+from compare.cache import get_default_cache as get_comparison_cache, make_comparison_key
+from compare.shortlist import SHORTLIST_TOP_K, SHORTLIST_THRESHOLD, get_field_vectors, group_field_vectors, shortlist
 load_dotenv()
 
 # Constants
-HF_TOKEN = os.getenv("TOKEN")
 MODEL_NAME = os.getenv("MODEL_NAME")
 FIELD_ORDER = ["Skills", "Education", "Experience", "Job Role"]
-
-# Initialize clients
-llm_client = InferenceClient(model=MODEL_NAME, token=HF_TOKEN)
+# `field` metadata written by the embedding stage for each prompt label
+FIELD_KEYS = {"Skills": "skill", "Education": "education", "Experience": "experience", "Job Role": "job role"}
+OTHER_INFO_KEY = "other information"
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Resumes scored against the same JD in one request (1 keeps one request per pair)
+COMPARE_GROUP_SIZE = int(os.getenv("COMPARE_GROUP_SIZE", "1"))
 
 # Prompt Templates
 system_prompt = """
@@ -299,25 +306,89 @@ Output:
 Return only the JSON object following the structure above. Do not add any extra text or commentary.
 """
 
-def get_collection_docs(client, collection_name):
+group_instructions_template = """
+You will compare {count} resumes against the same job description in this request.
+ 
+Score every resume independently, exactly as if it were the only resume. Do not rank resumes against each other.
+ 
+Return ONE JSON object with exactly these top-level keys, one per resume, and nothing else:
+{names}
+ 
+Each key's value must follow the per-resume structure described below (the value under "{{resume_filename}}").
+"""
+
+def get_document_ids(collection):
+    """Return the doc_ids stored in a shared collection, in insertion order."""
+    results = collection.get(include=["metadatas"])
+    doc_ids = {}
+    for metadata in results.get("metadatas") or []:
+        if metadata and metadata.get("doc_id"):
+            doc_ids.setdefault(metadata["doc_id"], None)
+    return list(doc_ids)
+
+def get_collection_docs(collection, doc_ids):
+    """Load several documents with one get(where=...) call -> {doc_id: {field: document}}.
+
+    Fields are keyed by the stored `field` metadata, never by the order Chroma returns them in.
+    """
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return {}
     try:
-        collection = client.get_collection(collection_name)
-        results = collection.get(include=["documents"])
-        docs = results.get("documents", [])
-        if docs and isinstance(docs[0], list):
-            docs = [d for sublist in docs for d in sublist]
-        return docs
+        results = collection.get(where={"doc_id": {"$in": doc_ids}}, include=["documents", "metadatas"])
+        docs_by_id = {doc_id: {} for doc_id in doc_ids}
+        for doc, metadata in zip(results.get("documents") or [], results.get("metadatas") or []):
+            field = (metadata.get("field") or "").lower()
+            if field:
+                docs_by_id.setdefault(metadata.get("doc_id"), {})[field] = doc
+        return docs_by_id
     except Exception as e:
-        print(f"[ERROR] Failed to load collection '{collection_name}': {e}")
-        return []
+        print(f"[ERROR] Failed to load documents from collection '{collection.name}': {e}")
+        return {}
 
-def build_field_texts(field_names, docs):
+def build_field_texts(field_names, fields):
     lines = []
-    for name, doc in zip(field_names, docs):
-        doc_clean = re.sub(rf"^{re.escape(name)}:\s*", "", doc, flags=re.IGNORECASE)
+    for name in field_names:
+        key = FIELD_KEYS[name]
+        doc_clean = re.sub(rf"^(?:{re.escape(name)}|{re.escape(key)}):\s*", "", fields[key], flags=re.IGNORECASE)
         lines.append(f"{name}: {doc_clean}")
     return "\n".join(lines)
 
+def build_document_entry(doc_id, fields):
+    """{field: document} -> {"text", "other_info"} as sent to the LLM, or None when a scored field is missing."""
+    missing = [name for name in FIELD_ORDER if FIELD_KEYS[name] not in fields]
+    if missing:
+        print(f"[WARNING] Skipping '{doc_id}': missing field(s) {', '.join(missing)}")
+        return None
+    return {
+        "text": build_field_texts(FIELD_ORDER, fields),
+        "other_info": fields.get(OTHER_INFO_KEY, ""),
+    }
+
+def group_field_documents(texts, metadatas):
+    """Group embedded field records (as written to Chroma) into {doc_id: {field: document}}."""
+    docs_by_id = {}
+    for text, metadata in zip(texts, metadatas):
+        field = (metadata.get("field") or "").lower()
+        if field:
+            docs_by_id.setdefault(metadata["doc_id"], {})[field] = text
+    return docs_by_id
+
+def load_document_table(collection, doc_ids):
+    """Read all documents with one bulk get and build {doc_id: {"text", "other_info"}} once.
+
+    Documents missing any of the scored fields are left out.
+    """
+    return build_document_table(get_collection_docs(collection, doc_ids), doc_ids)
+
+def build_document_table(docs_by_id, doc_ids):
+    table = {}
+    for doc_id in doc_ids:
+        entry = build_document_entry(doc_id, docs_by_id.get(doc_id, {}))
+        if entry is not None:
+            table[doc_id] = entry
+    return table
+
 def clean_llm_json(raw_response):
     raw = raw_response.strip()
     raw = re.sub(r"^```(?:json)?|```$", "", raw, flags=re.MULTILINE).strip()
@@ -344,74 +415,288 @@ def normalize_llm_response(data):
                     data[field][key] = ", ".join(map(str, value))
     return data
 
-def query_llm(system_prompt, user_prompt, retries=2):
+def query_llm(system_prompt, user_prompt, max_tokens=2048):
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    for attempt in range(retries):
-        try:
-            response = llm_client.chat_completion(messages=messages, max_tokens=2048, temperature=0.0, top_p=1.0, stop=["```"])
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"[ERROR] LLM call failed (attempt {attempt+1}): {e}")
-            time.sleep(1)
-    return ""
-
-def main(resume_db_path, jd_db_path):
     try:
-        start_time = time.time()
-        
-        jd_client = PersistentClient(path=jd_db_path)
-        resume_client = PersistentClient(path=resume_db_path)
+        # Shared per-model client, created on first use (rate limiting, retries and backoff live in inference.RateLimitedClient)
+        response = get_inference_client(MODEL_NAME).chat_completion(messages=messages, max_tokens=max_tokens, temperature=0.0, top_p=1.0, stop=["```"])
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"[ERROR] LLM call failed: {e}")
+        return ""
+
+def build_user_prompt(comparison_name, jd_text, jd_other_info, resume_text, resume_other_info):
+    user_prompt = user_prompt_template.format(resume_filename=comparison_name)
+    user_prompt += f"\n\nJob Description Other Information:\n{jd_other_info}"
+    user_prompt += f"\nResume Other Information:\n{resume_other_info}"
+    user_prompt += f"\n\nJob Description:\n{jd_text}\n\nResume:\n{resume_text}"
+    return user_prompt
+
+def build_group_prompt(pairs):
+    """One prompt scoring several resumes against the JD they share; the JD is included once."""
+    names = [pair["name"] for pair in pairs]
+    user_prompt = group_instructions_template.format(count=len(pairs), names="\n".join(f'"{name}"' for name in names))
+    user_prompt += user_prompt_template.format(resume_filename="{resume_filename}")
+    user_prompt += f"\n\nJob Description Other Information:\n{pairs[0]['jd_other_info']}"
+    user_prompt += f"\n\nJob Description:\n{pairs[0]['jd_text']}"
+    for pair in pairs:
+        user_prompt += f"\n\n### Resume: {pair['name']}"
+        user_prompt += f"\nResume Other Information:\n{pair['resume_other_info']}"
+        user_prompt += f"\n\nResume:\n{pair['resume_text']}"
+    return user_prompt
+
+def parse_llm_response(raw, label):
+    try:
+        cleaned = clean_llm_json(raw)
+        parsed = json.loads(cleaned)
+        return {k: normalize_llm_response(v) for k, v in parsed.items()}
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Failed to parse JSON response for {label}: {e}")
+    except Exception as e:
+        print(f"[ERROR] Processing response for {label}: {e}")
+    return None
+
+def get_cached_comparison(pair):
+    cache = get_comparison_cache()
+    if not cache:
+        return None
+    cached = cache.get(pair["cache_key"])
+    if cached is not None:
+        print(f"[INFO] Comparison cache hit for {pair['name']}")
+        return {pair["name"]: cached}
+    return None
+
+def is_complete_comparison(payload):
+    """True when a per-pair payload has the overall score and all four field objects."""
+    return (
+        isinstance(payload, dict)
+        and "OverallMatchPercentage" in payload
+        and all(isinstance(payload.get(name), dict) for name in FIELD_ORDER)
+    )
+
+def cache_comparison(pair, payload):
+    # Cache the per-pair payload without its name so renamed files still hit;
+    # truncated or off-format answers are never cached
+    cache = get_comparison_cache()
+    if cache and is_complete_comparison(payload):
+        cache.put(pair["cache_key"], payload)
+
+def compare_pair(pair):
+    cached = get_cached_comparison(pair)
+    if cached:
+        return cached
+
+    comparison_name = pair["name"]
+    user_prompt = build_user_prompt(
+        comparison_name, pair["jd_text"], pair["jd_other_info"], pair["resume_text"], pair["resume_other_info"]
+    )
+    raw = query_llm(system_prompt, user_prompt)
+    if not raw:
+        return None
+
+    parsed = parse_llm_response(raw, comparison_name)
+    if parsed and len(parsed) == 1:
+        cache_comparison(pair, next(iter(parsed.values())))
+    return parsed
+
+def compare_group(pairs):
+    """Score a group of pairs that share one JD; returns results in pair order.
 
-        # Get all collections (each collection represents one JD or resume)
-        jd_collections = [c.name for c in jd_client.list_collections()]
-        resume_collections = [c.name for c in resume_client.list_collections()]
+    Cache hits are resolved first. Resumes missing or malformed in the grouped reply
+    fall back to compare_pair.
+    """
+    start = time.perf_counter()
+    results = {}
+    pending = []
+    for pair in pairs:
+        cached = get_cached_comparison(pair)
+        if cached:
+            results[pair["name"]] = cached
+        else:
+            pending.append(pair)
+    cached_names = set(results)
 
-        if not jd_collections or not resume_collections:
-            raise ValueError("No collections found in the provided database paths")
+    if len(pending) > 1:
+        label = f"group of {len(pending)} for {pending[0]['jd_id']}"
+        raw = query_llm(system_prompt, build_group_prompt(pending), max_tokens=2048 * len(pending))
+        parsed = parse_llm_response(raw, label) if raw else None
+        for pair in list(pending):
+            payload = parsed.get(pair["name"]) if parsed else None
+            if is_complete_comparison(payload):
+                cache_comparison(pair, payload)
+                results[pair["name"]] = {pair["name"]: payload}
+                pending.remove(pair)
 
-        all_results = []
+    for pair in pending:
+        if len(pairs) > 1:
+            print(f"[INFO] Falling back to a single comparison for {pair['name']}")
+        results[pair["name"]] = compare_pair(pair)
 
-        for jd_collection in jd_collections:
-            jd_docs = get_collection_docs(jd_client, jd_collection)
-            if len(jd_docs) < 5:
+    # Every pair in the group waited for the whole group
+    elapsed = time.perf_counter() - start
+    for pair in pairs:
+        if pair["name"] in cached_names:
+            status = "cached"
+        else:
+            status = "ok" if results.get(pair["name"]) else "failed"
+        metrics.record_document("comparison", pair["name"], elapsed, status, group=len(pairs))
+
+    return [results[pair["name"]] for pair in pairs if results.get(pair["name"])]
+
+def group_pairs(pairs, group_size=None):
+    """Split pairs into work items of up to group_size pairs sharing the same JD."""
+    group_size = max(1, group_size or COMPARE_GROUP_SIZE)
+    groups = []
+    by_jd = {}
+    for pair in pairs:
+        by_jd.setdefault(pair["jd_id"], []).append(pair)
+    for jd_pairs in by_jd.values():
+        for start in range(0, len(jd_pairs), group_size):
+            groups.append(jd_pairs[start:start + group_size])
+    return groups
+
+def score_pairs(pairs, max_workers=None, group_size=None):
+    """Score pairs on a bounded thread pool, group_size resumes per request.
+
+    Results come back in the same order as `pairs`; failed comparisons are dropped.
+    """
+    if not pairs:
+        return []
+
+    groups = group_pairs(pairs, group_size)
+    workers = max(1, min(max_workers or LLM_CONCURRENCY, len(groups)))
+    print(f"[INFO] Scoring {len(pairs)} pair(s) in {len(groups)} request group(s) with {workers} worker(s)")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [metrics.submit(executor, compare_group, group) for group in groups]
+        for group, future in zip(groups, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                print(f"[ERROR] Comparison worker failed for {', '.join(p['name'] for p in group)}: {e}")
+    return results
+
+def iter_pair_results(pairs, max_workers=None, group_size=None):
+    """Like score_pairs, but yields each parsed result as soon as its request finishes."""
+    if not pairs:
+        return
+
+    groups = group_pairs(pairs, group_size)
+    workers = max(1, min(max_workers or LLM_CONCURRENCY, len(groups)))
+    print(f"[INFO] Streaming {len(pairs)} pair(s) in {len(groups)} request group(s) with {workers} worker(s)")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {metrics.submit(executor, compare_group, group): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                group_results = future.result()
+            except Exception as e:
+                print(f"[ERROR] Comparison worker failed for {', '.join(p['name'] for p in futures[future])}: {e}")
                 continue
+            for parsed in group_results:
+                yield parsed
+
+def make_pair(resume_id, resume, jd_id, jd):
+    """One comparison work item from two document table entries, with its cache key."""
+    cache_key = make_comparison_key(
+        f"{resume['text']}\n{resume['other_info']}",
+        f"{jd['text']}\n{jd['other_info']}",
+        MODEL_NAME,
+        system_prompt,
+        user_prompt_template
+    )
+    return {
+        "name": f"{resume_id}_vs_{jd_id}",
+        "jd_id": jd_id,
+        "jd_text": jd["text"],
+        "jd_other_info": jd["other_info"],
+        "resume_text": resume["text"],
+        "resume_other_info": resume["other_info"],
+        "cache_key": cache_key,
+    }
+
+def build_pairs(resume_db_path, jd_db_path, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD):
+    """Build one work item per JD x shortlisted resume, with the field texts and the cache key."""
+    from chromadb import PersistentClient
+    jd_client = PersistentClient(path=jd_db_path)
+    resume_client = PersistentClient(path=resume_db_path)
+
+    # One shared collection per kind; documents are told apart by their doc_id metadata
+    jd_collection = jd_client.get_or_create_collection(JD_COLLECTION)
+    resume_collection = resume_client.get_or_create_collection(RESUME_COLLECTION)
+    jd_ids = get_document_ids(jd_collection)
+    resume_ids = get_document_ids(resume_collection)
+
+    if not jd_ids or not resume_ids:
+        raise ValueError("No documents found in the provided database paths")
 
-            jd_text = build_field_texts(FIELD_ORDER, jd_docs[:4])
-            jd_other_info = jd_docs[4] if len(jd_docs) > 4 else ""
+    # Vector pre-filter: only the best-matching resumes per JD are sent to the LLM
+    use_shortlist = bool(top_k) or threshold is not None
+    resume_vectors = {}
+    jd_vectors_by_id = {}
+    if use_shortlist:
+        resume_vectors = get_field_vectors(resume_collection, resume_ids)
+        jd_vectors_by_id = get_field_vectors(jd_collection, jd_ids)
 
-            for resume_collection in resume_collections:
-                resume_docs = get_collection_docs(resume_client, resume_collection)
-                if len(resume_docs) < 5:
-                    continue
+    # Candidate table: every resume is read and formatted once, then reused for every JD
+    jd_table = load_document_table(jd_collection, jd_ids)
+    resume_table = load_document_table(resume_collection, resume_ids)
+    return pair_documents(resume_table, jd_table, resume_ids, resume_vectors, jd_vectors_by_id, top_k, threshold)
 
-                resume_text = build_field_texts(FIELD_ORDER, resume_docs[:4])
-                resume_other_info = resume_docs[4] if len(resume_docs) > 4 else ""
+def build_pairs_from_records(resume_embedded, jd_embedded, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD):
+    """build_pairs for the (texts, embeddings, metadatas) returned by embed_records, without opening Chroma."""
+    resume_texts, resume_embeddings, resume_metadatas = resume_embedded
+    jd_texts, jd_embeddings, jd_metadatas = jd_embedded
+    resume_docs = group_field_documents(resume_texts, resume_metadatas)
+    jd_docs = group_field_documents(jd_texts, jd_metadatas)
 
-                comparison_name = f"{resume_collection}_vs_{jd_collection}"
+    if not jd_docs or not resume_docs:
+        raise ValueError("No embedded documents to compare")
 
-                user_prompt = user_prompt_template.format(resume_filename=comparison_name)
-                user_prompt += f"\n\nJob Description Other Information:\n{jd_other_info}"
-                user_prompt += f"\nResume Other Information:\n{resume_other_info}"
-                user_prompt += f"\n\nJob Description:\n{jd_text}\n\nResume:\n{resume_text}"
+    use_shortlist = bool(top_k) or threshold is not None
+    resume_vectors = group_field_vectors(resume_embeddings, resume_metadatas) if use_shortlist else {}
+    jd_vectors_by_id = group_field_vectors(jd_embeddings, jd_metadatas) if use_shortlist else {}
 
-                raw = query_llm(system_prompt, user_prompt)
-                if not raw:
-                    continue
+    jd_table = build_document_table(jd_docs, list(jd_docs))
+    resume_table = build_document_table(resume_docs, list(resume_docs))
+    return pair_documents(resume_table, jd_table, list(resume_docs), resume_vectors, jd_vectors_by_id, top_k, threshold)
 
-                try:
-                    cleaned = clean_llm_json(raw)
-                    parsed = json.loads(cleaned)
-                    parsed = {k: normalize_llm_response(v) for k, v in parsed.items()}
-                    all_results.append(parsed)
-                except json.JSONDecodeError as e:
-                    print(f"[ERROR] Failed to parse JSON response for {comparison_name}: {e}")
-                    continue
-                except Exception as e:
-                    print(f"[ERROR] Processing response for {comparison_name}: {e}")
-                    continue
+def pair_documents(resume_table, jd_table, resume_ids, resume_vectors, jd_vectors_by_id, top_k, threshold):
+    pairs = []
+    for jd_id, jd in jd_table.items():
+        candidates = resume_ids
+        jd_vectors = jd_vectors_by_id.get(jd_id)
+        if jd_vectors:
+            ranked = shortlist(jd_vectors, resume_vectors, top_k=top_k, threshold=threshold)
+            candidates = [name for name, _ in ranked]
+            print(f"[INFO] Shortlisted {len(candidates)}/{len(resume_ids)} resume(s) for '{jd_id}'")
+
+        for resume_id in candidates:
+            resume = resume_table.get(resume_id)
+            if resume is None:
+                continue
+
+            pairs.append(make_pair(resume_id, resume, jd_id, jd))
+
+    return pairs
+
+def main(resume_db_path, jd_db_path, max_workers=None, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD, group_size=None):
+    return compare_all(build_pairs, resume_db_path, jd_db_path, max_workers, top_k, threshold, group_size)
+
+def compare_records(resume_embedded, jd_embedded, max_workers=None, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD, group_size=None):
+    """main for in-memory embedding output (see embed_records): no Chroma store is opened."""
+    return compare_all(build_pairs_from_records, resume_embedded, jd_embedded, max_workers, top_k, threshold, group_size)
+
+def compare_all(build, resume_source, jd_source, max_workers, top_k, threshold, group_size):
+    try:
+        start_time = time.time()
+
+        pairs = build(resume_source, jd_source, top_k=top_k, threshold=threshold)
+        all_results = score_pairs(pairs, max_workers=max_workers, group_size=group_size)
 
         if not all_results:
             raise ValueError("No valid comparisons were generated")
@@ -421,4 +706,21 @@ def main(resume_db_path, jd_db_path):
 
     except Exception as e:
         print(f"[ERROR] In main comparison function: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def stream(resume_db_path, jd_db_path, max_workers=None, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD, group_size=None):
+    """Generator counterpart of main: yields comparison results in completion order."""
+    return stream_all(build_pairs, resume_db_path, jd_db_path, max_workers, top_k, threshold, group_size)
+
+def stream_records(resume_embedded, jd_embedded, max_workers=None, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD, group_size=None):
+    """Generator counterpart of compare_records."""
+    return stream_all(build_pairs_from_records, resume_embedded, jd_embedded, max_workers, top_k, threshold, group_size)
+
+def stream_all(build, resume_source, jd_source, max_workers, top_k, threshold, group_size):
+    start_time = time.time()
+    pairs = build(resume_source, jd_source, top_k=top_k, threshold=threshold)
+    count = 0
+    for parsed in iter_pair_results(pairs, max_workers=max_workers, group_size=group_size):
+        count += 1
+        yield parsed
+    print(f"\n[INFO] Streamed {count} comparison(s) in {time.time() - start_time:.2f} sec")
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+# Same weights the comparison prompt asks the LLM to use for OverallMatchPercentage
+FIELD_WEIGHTS = {
+    "skill": 0.35,
+    "experience": 0.30,
+    "education": 0.20,
+    "job role": 0.15,
+}
+
+SHORTLIST_TOP_K = int(os.getenv("SHORTLIST_TOP_K", "0")) or None
+SHORTLIST_THRESHOLD = float(os.getenv("SHORTLIST_THRESHOLD")) if os.getenv("SHORTLIST_THRESHOLD") else None
+
+def get_field_vectors(collection, doc_ids=None):
+    """Return {doc_id: {field: embedding}} for the given documents (all when None) in one get call."""
+    try:
+        if doc_ids is None:
+            results = collection.get(include=["embeddings", "metadatas"])
+        elif not doc_ids:
+            return {}
+        else:
+            results = collection.get(where={"doc_id": {"$in": list(doc_ids)}}, include=["embeddings", "metadatas"])
+        embeddings = results.get("embeddings")
+        metadatas = results.get("metadatas")
+        if embeddings is None or metadatas is None:
+            return {}
+        return group_field_vectors(embeddings, metadatas)
+    except Exception as e:
+        print(f"[ERROR] Failed to load vectors from collection '{collection.name}': {e}")
+        return {}
+
+def group_field_vectors(embeddings, metadatas):
+    """Group field embeddings by their doc_id/field metadata -> {doc_id: {field: embedding}}."""
+    vectors = {}
+    for embedding, metadata in zip(embeddings, metadatas):
+        doc_id = (metadata or {}).get("doc_id")
+        field = (metadata or {}).get("field")
+        if doc_id and field:
+            vectors.setdefault(doc_id, {})[field.lower()] = np.asarray(embedding, dtype=np.float32)
+    return vectors
+
+def cosine_similarity(a, b):
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    if denom == 0.0:
+        return 0.0
+    return float(np.dot(a, b) / denom)
+
+def weighted_similarity(jd_vectors, resume_vectors):
+    """Field-weighted cosine similarity; a field missing on either side contributes zero."""
+    score = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        if field in jd_vectors and field in resume_vectors:
+            score += weight * cosine_similarity(jd_vectors[field], resume_vectors[field])
+    return score / sum(FIELD_WEIGHTS.values())
+
+def shortlist(jd_vectors, candidates, top_k=None, threshold=None):
+    """Rank candidates ({name: field vectors}) against a JD and keep the top_k and/or those >= threshold.
+
+    Returns a list of (name, score) tuples, best match first.
+    """
+    scored = [(name, weighted_similarity(jd_vectors, vectors)) for name, vectors in candidates.items()]
+    scored.sort(key=lambda item: item[1], reverse=True)
+
+    if threshold is not None:
+        scored = [(name, score) for name, score in scored if score >= threshold]
+    if top_k:
+        scored = scored[:top_k]
+    return scored
@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import metrics
+load_dotenv()
+
+# How embedded field records reach Chroma: "sync" (before comparing), "async" (background writer) or "off".
+# The comparison of a run works from the in-memory records either way; Chroma is what later
+# incremental runs and the database-path comparison (compare.llm.main) read from.
+# Queued writes are lost if the process exits first, so whoever owns the process calls flush():
+# main.main/main.stream at the end of a run, the API server on shutdown.
+CHROMA_PERSIST = os.getenv("CHROMA_PERSIST", "async").lower()
+# Writes queued for the background writer at most; each holds its texts and embeddings in memory.
+# A full queue makes the caller wait for a slot rather than write inline, which would
+# overtake the writes still queued (e.g. a run's clean-up of the collection)
+CHROMA_SINK_QUEUE_SIZE = int(os.getenv("CHROMA_SINK_QUEUE_SIZE", "8"))
+
+# One writer thread per process, so writes land in the order they were queued
+_writer = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, CHROMA_SINK_QUEUE_SIZE))
+
+def _get_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer")
+    return _writer
+
+def _run_logged(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        print(f"[ERROR] Background Chroma write failed: {e}")
+        return None
+    finally:
+        _slots.release()
+
+def persist(func, *args, mode=None):
+    """Run the Chroma write `func(*args)` according to `mode` (CHROMA_PERSIST when None).
+
+    Returns func's result when written inline, otherwise None. In async mode this blocks
+    while CHROMA_SINK_QUEUE_SIZE writes are already queued.
+    """
+    mode = mode or CHROMA_PERSIST
+    if mode == "off":
+        return None
+    if mode != "async":
+        return func(*args)
+    _slots.acquire()
+    try:
+        metrics.submit(_get_writer(), _run_logged, func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    return None
+
+def flush():
+    """Wait for every queued background write; readers of a Chroma folder call this first."""
+    if _writer is not None:
+        _writer.submit(lambda: None).result()
@@ -0,0 +1,318 @@
+import os
+import json
+import re
+import time
+from embedding.model_registry import EMBED_BATCH_SIZE, get_embedder
+from embedding import chroma_sink
+from manifest import file_hash
+import metrics
+
+CHROMA_ADD_BATCH_SIZE = 5000
+
+def load_json_from_file(json_path):
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data
+    except Exception as e:
+        print(f"[ERROR] Failed to load JSON from file {json_path}: {e}")
+        return {}
+
+def init_chromadb(persist_dir):
+    try:
+        from chromadb import PersistentClient
+        return PersistentClient(path=persist_dir)
+    except Exception as e:
+        print(f"[ERROR] Failed to initialize Chroma DB: {e}")
+        return None
+
+def sanitize_doc_id(name):
+    """Sanitize file name to the doc_id stored in ChromaDB metadata."""
+    name = os.path.splitext(name)[0]
+    name = re.sub(r'\s+', '_', name)
+    name = re.sub(r'[^a-zA-Z0-9._-]', '', name)
+    name = re.sub(r'^[^a-zA-Z0-9]+', '', name)
+    name = re.sub(r'[^a-zA-Z0-9]+$', '', name)
+    if len(name) < 3:
+        name = (name + "___")[:3]
+    return name
+
+class FieldCollection:
+    """One shared Chroma collection of per-field records (doc_id/field metadata) and how it is filled.
+
+    resume_embedding and jd_embedding each wrap one instance; they differ only in the
+    collection name and the label used in log lines.
+    """
+
+    def __init__(self, name, label):
+        self.name = name
+        self.label = label
+
+    def get_collection(self, persist_dir):
+        client = init_chromadb(persist_dir)
+        if not client:
+            print("[ERROR] ChromaDB client initialization failed.")
+            return None
+        return client.get_or_create_collection(name=self.name)
+
+    def collect_field_texts(self, data, doc_id):
+        """Flatten parsed JSON into labeled field texts and their doc_id/field metadata."""
+        if isinstance(data, dict):
+            data = [data]
+
+        texts = []
+        metadatas = []
+
+        for idx, document in enumerate(data):
+            print(f"\n[INFO] Collecting fields for {self.label} #{idx+1} -> Document: {doc_id}")
+
+            # Embed all fields present in the JSON
+            for field in document:
+                content = document.get(field)
+
+                if content is None or (isinstance(content, str) and content.strip() == ""):
+                    content_str = "null"
+                elif isinstance(content, dict):
+                    content_str = "; ".join([f"{k}: {v}" for k, v in content.items()])
+                elif isinstance(content, list):
+                    content_str = "; ".join(map(str, content))
+                else:
+                    content_str = str(content).strip()
+
+                labeled_text = f"{field}: {content_str}"
+
+                print(f" Field: {field}")
+                print(f" Content: {content_str[:150]}...\n")
+
+                texts.append(labeled_text)
+                metadatas.append({"doc_id": doc_id, "field": field})
+
+        return texts, metadatas
+
+    def encode_texts(self, texts, batch_size=EMBED_BATCH_SIZE):
+        with metrics.timed("embedding_encode_seconds", collection=self.name):
+            embeddings = get_embedder().encode(texts, batch_size=batch_size)
+        metrics.inc("embedding_texts_total", len(texts), collection=self.name)
+        return embeddings
+
+    def store_embedded_fields(self, collection, texts, embeddings, metadatas):
+        """Upsert field records in chunks; ids are `<doc_id>:<field>` so re-embedding replaces in place."""
+        if hasattr(embeddings, "tolist"):
+            embeddings = embeddings.tolist()
+
+        ids = [f"{m['doc_id']}:{m['field']}" for m in metadatas]
+        doc_ids = sorted(set(m["doc_id"] for m in metadatas))
+
+        # Drop stale fields of the documents being rewritten before upserting the new ones
+        if doc_ids:
+            collection.delete(where={"doc_id": {"$in": doc_ids}})
+
+        with metrics.timed("chroma_write_seconds", collection=collection.name):
+            for start in range(0, len(ids), CHROMA_ADD_BATCH_SIZE):
+                end = start + CHROMA_ADD_BATCH_SIZE
+                collection.upsert(
+                    ids=ids[start:end],
+                    documents=texts[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end]
+                )
+        metrics.inc("chroma_records_written_total", len(ids), collection=collection.name)
+
+        print(f"[INFO] Stored {len(ids)} embedded field(s) for {len(doc_ids)} document(s) in collection '{collection.name}'")
+        return len(ids)
+
+    def embed_and_store_fields(self, data, doc_id, persist_dir):
+        collection = self.get_collection(persist_dir)
+        if collection is None:
+            return False
+
+        texts, metadatas = self.collect_field_texts(data, doc_id)
+        if not texts:
+            print(f"[WARNING] No valid fields to embed for document '{doc_id}'")
+            return False
+
+        embeddings = self.encode_texts(texts)
+        self.store_embedded_fields(collection, texts, embeddings, metadatas)
+
+        try:
+            count = len(collection.get(where={"doc_id": doc_id}, include=[])["ids"])
+            print(f"[SUCCESS] Document '{doc_id}' has {count} field record(s).\n")
+            return count > 0
+        except Exception as e:
+            print(f"[ERROR] Verification failed for document '{doc_id}': {e}")
+            return False
+
+    def remove_documents_except(self, persist_dir, valid_docs):
+        """Remove stored documents not in valid_docs, and legacy per-file collections."""
+        client = init_chromadb(persist_dir)
+        if not client:
+            return
+
+        for c in client.list_collections():
+            name = c if isinstance(c, str) else c.name
+            if name != self.name:
+                try:
+                    client.delete_collection(name=name)
+                    print(f"[INFO] Removed legacy collection: {name}")
+                except Exception as e:
+                    print(f"[ERROR] Could not remove legacy collection '{name}': {e}")
+
+        collection = client.get_or_create_collection(name=self.name)
+        stored = collection.get(include=["metadatas"])
+        existing_docs = set(m.get("doc_id") for m in stored.get("metadatas") or [] if m)
+        orphan_docs = sorted(existing_docs - set(valid_docs))
+        if orphan_docs:
+            try:
+                collection.delete(where={"doc_id": {"$in": orphan_docs}})
+                print(f"[INFO] Removed orphan document(s): {', '.join(orphan_docs)}")
+            except Exception as e:
+                print(f"[ERROR] Could not remove orphan documents: {e}")
+
+    def remove_orphan_documents(self, folder_path, persist_dir):
+        """Remove stored documents (and legacy per-file collections) that no longer have a JSON file."""
+        json_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.json')]
+        self.remove_documents_except(persist_dir, set(sanitize_doc_id(f) for f in json_files))
+
+    def embed_all_jsons_from_folder(self, folder_path, persist_dir, bulk=True, batch_size=EMBED_BATCH_SIZE, manifest=None):
+        os.makedirs(persist_dir, exist_ok=True)
+
+        files = [f for f in os.listdir(folder_path) if f.lower().endswith('.json')]
+        print(f"\n[INFO] Found {len(files)} JSON files in folder '{folder_path}'.")
+
+        # Remove documents that do not have a corresponding JSON file
+        self.remove_orphan_documents(folder_path, persist_dir)
+
+        if not files:
+            print("[WARNING] No JSON files found to embed.")
+            return
+
+        # Incremental runs only re-embed JSON files whose content changed since they were last stored
+        hashes = {}
+        if manifest is not None:
+            for name in manifest.names("embedded"):
+                if name not in files:
+                    manifest.forget("embedded", name)
+            hashes = {f: file_hash(os.path.join(folder_path, f)) for f in files}
+            files = [f for f in files if not manifest.is_current("embedded", f, hashes[f])]
+            print(f"[INFO] Incremental mode: {len(files)} new or modified JSON file(s) to embed.")
+            if not files:
+                return
+
+        def record_embedded(file, fields):
+            if manifest is not None:
+                doc_id = sanitize_doc_id(file)
+                manifest.record("embedded", file, hash=hashes[file], doc_id=doc_id,
+                                ids=[f"{doc_id}:{field}" for field in fields])
+
+        if not bulk:
+            for file in files:
+                json_path = os.path.join(folder_path, file)
+                doc_id = sanitize_doc_id(file)
+
+                print(f"\n[INFO] Processing file: {file} -> Document: '{doc_id}'")
+
+                start = time.perf_counter()
+                try:
+                    json_data = load_json_from_file(json_path)
+                    success = self.embed_and_store_fields(json_data, doc_id=doc_id, persist_dir=persist_dir)
+                    metrics.record_document("embedding", file, time.perf_counter() - start, "ok" if success else "failed")
+                    if success:
+                        record_embedded(file, list(json_data) if isinstance(json_data, dict) else [])
+                        print(f"[SUCCESS] Embedding completed and verified for: {file}")
+                    else:
+                        print(f"[WARNING] Embedding failed or document is empty for: {file}")
+                except Exception as e:
+                    metrics.record_document("embedding", file, time.perf_counter() - start, "failed")
+                    print(f"[ERROR] Failed to process {file}: {e}")
+            return
+
+        # Bulk mode: gather every field text in the folder, encode them together, then write them in one pass
+        start = time.perf_counter()
+        all_texts = []
+        all_metadatas = []
+        metadatas_by_file = {}
+        for file in files:
+            json_data = load_json_from_file(os.path.join(folder_path, file))
+            texts, metadatas = self.collect_field_texts(json_data, sanitize_doc_id(file))
+            if not texts:
+                print(f"[WARNING] No valid fields to embed for: {file}")
+                continue
+            all_texts.extend(texts)
+            all_metadatas.extend(metadatas)
+            metadatas_by_file[file] = metadatas
+
+        if not all_texts:
+            return
+
+        print(f"[INFO] Encoding {len(all_texts)} field(s) from {len(files)} file(s) in batches of {batch_size}")
+        embeddings = self.encode_texts(all_texts, batch_size=batch_size)
+
+        try:
+            collection = self.get_collection(persist_dir)
+            if collection is None:
+                return
+            self.store_embedded_fields(collection, all_texts, embeddings, all_metadatas)
+            # One bulk pass for all files; each file is charged its share of the time
+            elapsed = (time.perf_counter() - start) / len(metadatas_by_file)
+            for file, metadatas in metadatas_by_file.items():
+                record_embedded(file, [m["field"] for m in metadatas])
+                metrics.record_document("embedding", file, elapsed, "ok", bulk=len(metadatas_by_file))
+            print(f"[SUCCESS] Collection '{self.name}' contains {collection.count()} field record(s).")
+        except Exception as e:
+            for file in metadatas_by_file:
+                metrics.record_document("embedding", file, 0.0, "failed", bulk=len(metadatas_by_file))
+            print(f"[ERROR] Failed to store embeddings from '{folder_path}': {e}")
+
+    def write_records(self, persist_dir, doc_ids, texts, embeddings, metadatas):
+        """Make the collection hold exactly doc_ids, with the given field records stored for them."""
+        self.remove_documents_except(persist_dir, doc_ids)
+        return self.store_records(persist_dir, texts, embeddings, metadatas)
+
+    def store_records(self, persist_dir, texts, embeddings, metadatas):
+        """store_embedded_fields into the collection under persist_dir; returns the number of records stored."""
+        if not texts:
+            return 0
+        collection = self.get_collection(persist_dir)
+        if collection is None:
+            return 0
+        return self.store_embedded_fields(collection, texts, embeddings, metadatas)
+
+    def embed_records(self, records, persist_dir, batch_size=EMBED_BATCH_SIZE, persist=None):
+        """In-memory counterpart of embed_all_jsons_from_folder for {source file: parsed fields} records.
+
+        Returns (texts, embeddings, metadatas) of every embedded field, which is what the comparison
+        of this run works from. The collection is brought in line with these records through
+        chroma_sink (CHROMA_PERSIST unless `persist` is given), so it may be written after this returns.
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        doc_ids = {source: sanitize_doc_id(os.path.basename(source)) for source in records}
+        start = time.perf_counter()
+        all_texts = []
+        all_metadatas = []
+        for source, data in records.items():
+            texts, metadatas = self.collect_field_texts(data, doc_ids[source])
+            if not texts:
+                print(f"[WARNING] No valid fields to embed for: {source}")
+                continue
+            all_texts.extend(texts)
+            all_metadatas.extend(metadatas)
+
+        if not all_texts:
+            print("[WARNING] No parsed records to embed.")
+            chroma_sink.persist(self.write_records, persist_dir, set(), [], [], [], mode=persist)
+            return [], [], []
+
+        print(f"[INFO] Encoding {len(all_texts)} field(s) from {len(records)} record(s) in batches of {batch_size}")
+        embeddings = self.encode_texts(all_texts, batch_size=batch_size)
+
+        stored_docs = sorted(set(m["doc_id"] for m in all_metadatas))
+        elapsed = (time.perf_counter() - start) / len(stored_docs)
+        for doc_id in stored_docs:
+            metrics.record_document("embedding", doc_id, elapsed, "ok", bulk=len(stored_docs))
+
+        try:
+            chroma_sink.persist(self.write_records, persist_dir, set(stored_docs), all_texts, embeddings, all_metadatas, mode=persist)
+        except Exception as e:
+            # The in-memory records are still good for this run; only later readers of the folder miss them
+            print(f"[ERROR] Failed to store embeddings in '{persist_dir}': {e}")
+        return all_texts, embeddings, all_metadatas
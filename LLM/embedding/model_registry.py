@@ -0,0 +1,34 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+
+# One loaded model per name, shared by the resume/JD embedders and the API server
+_models = {}
+_lock = threading.Lock()
+
+def get_embedder(model_name=EMBEDDING_MODEL):
+    """Return the process-wide SentenceTransformer for `model_name`, loading it on first use."""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            # Importing sentence_transformers pulls in torch, so it waits until a model is needed
+            from sentence_transformers import SentenceTransformer
+            print(f"[INFO] Loading embedding model '{model_name}'")
+            model = SentenceTransformer(model_name)
+            _models[model_name] = model
+    return model
+
+def warm_up(model_name=EMBEDDING_MODEL):
+    """Load the embedding model ahead of the first request."""
+    start = time.time()
+    get_embedder(model_name)
+    print(f"[INFO] Embedding model '{model_name}' ready in {time.time() - start:.2f}s")
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1") != "0"
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "resume_shortlister", "extraction")
+)
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "256"))
+
+def make_cache_key(cleaned_text, model_name, prompt):
+    """Stable key over the cleaned document text, the model and the exact prompt (its version)."""
+    prompt_version = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    h = hashlib.sha256()
+    for part in (model_name or "", prompt_version, cleaned_text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ExtractionCache:
+    """On-disk JSON cache of parsed extraction results with size-bounded LRU eviction.
+
+    Recency is the file mtime, refreshed on every hit, so eviction order survives restarts.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+            metrics.inc("cache_requests_total", cache="extraction", result="hit")
+            return data
+        except FileNotFoundError:
+            metrics.inc("cache_requests_total", cache="extraction", result="miss")
+            return None
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable cache entry {path}: {e}")
+            metrics.inc("cache_requests_total", cache="extraction", result="error")
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[WARNING] Could not write cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under 90% of the limit
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                total -= size
+            except Exception as e:
+                print(f"[WARNING] Could not evict cache entry {path}: {e}")
+        self._size = total
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Process-wide extraction cache, or None when EXTRACTION_CACHE_ENABLED=0."""
+    global _default_cache
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+    return _default_cache
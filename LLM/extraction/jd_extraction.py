@@ -1,18 +1,23 @@
 import os
 import json
 import re
-import fitz  # PyMuPDF
-from docx import Document
-from huggingface_hub import InferenceClient
+import time
+from inference import get_inference_client
+from extraction.text_extraction import extract_text_from_file, iter_extracted_texts
+from manifest import select_changed_sources, discard_extraction
+from extraction.cache import get_default_cache, make_cache_key
+from extraction.persistence import EXTRACTION_JSON_PERSIST, JsonPersister
+import metrics
 from dotenv import load_dotenv
 load_dotenv()
  
  
 class LLMJDParser:
-    def __init__(self, model_name=os.getenv("MODEL_NAME")):
+    def __init__(self, model_name=os.getenv("MODEL_NAME"), cache=None):
         self.model = model_name
+        self.cache = cache or get_default_cache()
 
-        self.client = InferenceClient(model=self.model, token=os.getenv("TOKEN"))
+        self.client = get_inference_client(self.model)
         self.system_prompt = self._build_system_prompt()
  
     def _build_system_prompt(self):
@@ -127,6 +132,12 @@ job role must contain only one job title — no composite or repeated roles.
  
     def extract_fields(self, jd_text: str) -> dict:
         cleaned_text = self.clean_text(jd_text)
+        cache_key = make_cache_key(cleaned_text, self.model, self.system_prompt)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(" Extraction cache hit")
+                return cached
  
         try:
             messages = [
@@ -164,6 +175,10 @@ job role must contain only one job title — no composite or repeated roles.
                 if key not in result or not isinstance(result[key], list):
                     result[key] = []
  
+            # An empty or off-format reply is not cached, so the next run asks again
+            if self.cache and any(result.get(key) for key in required_keys):
+                self.cache.put(cache_key, result)
+ 
             return result
  
         except Exception as e:
@@ -183,44 +198,12 @@ job role must contain only one job title — no composite or repeated roles.
             with open(output_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2)
             print(f" Saved: {output_path}")
+            return output_path
         except Exception as e:
             print(f" Failed to save {output_path}: {e}")
  
     def extract_text_from_file(self, file_path: str) -> str:
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".pdf":
-            try:
-                doc = fitz.open(file_path)
-                texts = []
-                for page in doc:
-                    text = page.get_text()
-                    if not text.strip():
-                        blocks = page.get_text("blocks")
-                        text = "\n".join(
-                            b[4].strip() for b in sorted(blocks, key=lambda b: (b[1], b[0])) if b[4].strip()
-                        )
-                    texts.append(text.strip())
-                return " ".join(texts)
-            except Exception as e:
-                print(f" Error reading PDF {file_path}: {e}")
-                return ""
-        elif ext == ".docx":
-            try:
-                doc = Document(file_path)
-                return " ".join(para.text.strip() for para in doc.paragraphs if para.text.strip())
-            except Exception as e:
-                print(f" Error reading DOCX {file_path}: {e}")
-                return ""
-        elif ext == ".txt":
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return f.read()
-            except Exception as e:
-                print(f" Error reading TXT {file_path}: {e}")
-                return ""
-        else:
-            print(f"Unsupported file format: {file_path}")
-            return ""
+        return extract_text_from_file(file_path)
  
  
 # Clear old JSON files
@@ -239,10 +222,17 @@ def clear_json_folder(folder_path):
  
  
 #  Main JD parsing logic
-def process_jds(input_path: str, output_dir: str):
+def process_jds(input_path: str, output_dir: str, manifest=None, persist=None):
+    """Parse every JD at input_path and return {file_path: fields}; JSON copies are written like process_resumes."""
     parser = LLMJDParser()
+    persister = JsonPersister(parser, output_dir, mode="sync" if manifest is not None else (persist or EXTRACTION_JSON_PERSIST))
+    records = {}
  
-    clear_json_folder(output_dir)
+    # Incremental runs keep earlier JSON outputs and only re-extract new or modified files
+    if manifest is None:
+        clear_json_folder(output_dir)
+    else:
+        os.makedirs(output_dir, exist_ok=True)
  
     if os.path.isfile(input_path):
         files = [input_path] if input_path.lower().endswith((".pdf", ".docx", ".txt")) else []
@@ -251,13 +241,34 @@ def process_jds(input_path: str, output_dir: str):
                  if f.lower().endswith((".pdf", ".docx", ".txt"))]
     else:
         print(f" Invalid path: {input_path}")
-        return
+        return records
+ 
+    hashes = {}
+    if manifest is not None:
+        hashes = select_changed_sources(manifest, files, output_dir)
+        files = list(hashes)
  
-    for file_path in files:
+    for file_path, text in iter_extracted_texts(files):
         print(f"\n Processing JD: {file_path}")
-        text = parser.extract_text_from_file(file_path)
         if not text.strip():
             print(f" Skipped empty or unreadable JD file: {file_path}")
+            if manifest is not None:
+                discard_extraction(manifest, file_path, output_dir)
             continue
+        start = time.perf_counter()
         parsed = parser.extract_fields(text)
-        parser.save_to_json(parsed, output_dir, file_path)
\ No newline at end of file
+        ok = bool(parsed) and any(parsed.values())
+        metrics.record_document("llm_extraction", file_path, time.perf_counter() - start, "ok" if ok else "failed")
+        if not ok:
+            print(" Skipping save: No valid JSON returned.")
+            if manifest is not None:
+                discard_extraction(manifest, file_path, output_dir)
+            continue
+        records[file_path] = parsed
+        output_path = persister.save(parsed, file_path)
+        if manifest is not None and output_path:
+            manifest.record("extracted", os.path.basename(file_path),
+                            hash=hashes[file_path], json=os.path.basename(output_path))
+ 
+    persister.close()
+    return records
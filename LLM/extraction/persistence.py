@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+# How parsed records are written to json_resume/json_jd: "sync", "async" (background thread) or "off"
+EXTRACTION_JSON_PERSIST = os.getenv("EXTRACTION_JSON_PERSIST", "async").lower()
+
+class JsonPersister:
+    """Writes parsed records with the parser's save_to_json, inline or on a background writer thread.
+
+    The records themselves are handed to the embedding stage in memory; the JSON files are an
+    audit trail. Incremental runs record the JSON names in the manifest, so they always write inline.
+    """
+
+    def __init__(self, parser, output_dir, mode=EXTRACTION_JSON_PERSIST):
+        self.parser = parser
+        self.output_dir = output_dir
+        self.mode = mode if mode in ("sync", "async", "off") else "sync"
+        self.executor = None
+        if self.mode == "async":
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="json-writer")
+
+    def save(self, data, original_file):
+        """Returns the JSON path when written inline, otherwise None."""
+        if self.mode == "off":
+            return None
+        if self.executor is None:
+            return self.parser.save_to_json(data, self.output_dir, original_file)
+        self.executor.submit(self.parser.save_to_json, data, self.output_dir, original_file)
+        return None
+
+    def close(self, wait=False):
+        # Queued writes still finish when wait=False; the caller just does not block on them
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
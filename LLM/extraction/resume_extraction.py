@@ -1,19 +1,27 @@
 import os
 import json
 import re
-import requests
-import fitz  
-from docx import Document  
+import time
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from inference import get_inference_client
+from extraction.text_extraction import extract_text_from_file, iter_extracted_texts
+from manifest import select_changed_sources, discard_extraction
+from extraction.cache import get_default_cache, make_cache_key
+from extraction.persistence import EXTRACTION_JSON_PERSIST, JsonPersister
+import metrics
 from dotenv import load_dotenv
 load_dotenv()
  
+# Number of resumes packed into one extraction request (1 disables batching)
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "1"))
+REQUIRED_KEYS = ["skill", "education", "experience", "job role", "other information"]
+ 
  
 class LLMResumeParser:
-    def __init__(self, model_name=os.getenv("MODEL_NAME")):
+    def __init__(self, model_name=os.getenv("MODEL_NAME"), cache=None):
         self.model = model_name
-        self.client = InferenceClient(model=self.model, token=os.getenv("TOKEN"))
+        self.cache = cache or get_default_cache()
+        self.client = get_inference_client(self.model)
         self.system_prompt = self._build_system_prompt()
  
     def _build_system_prompt(self):
@@ -91,6 +99,12 @@ Strict Rules:
  
     def extract_fields(self, resume_text: str) -> dict:
         cleaned_text = self.clean_text(resume_text)
+        cache_key = make_cache_key(cleaned_text, self.model, self.system_prompt)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(" Extraction cache hit")
+                return cached
        
         try:
            
@@ -126,10 +140,11 @@ Strict Rules:
                 return {}
  
             # Ensure all required keys are present
-            required_keys = ["skill", "education", "experience", "job role", "other information"]
-            for key in required_keys:
-                if key not in result or not isinstance(result[key], list):
-                    result[key] = []
+            result = self._ensure_required_keys(result)
+ 
+            # An empty or off-format reply is not cached, so the next run asks again
+            if self.cache and self._has_fields(result):
+                self.cache.put(cache_key, result)
  
             return result
  
@@ -137,6 +152,89 @@ Strict Rules:
             print(f" Error calling or parsing LLM output: {e}")
             return {}
  
+    def _ensure_required_keys(self, result: dict) -> dict:
+        for key in REQUIRED_KEYS:
+            if key not in result or not isinstance(result[key], list):
+                result[key] = []
+        return result
+ 
+    def _has_fields(self, result: dict) -> bool:
+        return any(result.get(key) for key in REQUIRED_KEYS)
+ 
+    def _build_batch_instructions(self) -> str:
+        return '''
+ 
+Batch Mode:
+The user message contains several resumes. Each one starts on its own line with "### RESUME <id>" and runs until the next such line.
+Parse every resume independently using the rules above.
+Return exactly one JSON object whose keys are the resume ids (e.g. "R1", "R2") and whose values are the five-key object from the Output Format for that resume.
+Do not merge information across resumes. Do not omit any id.
+'''
+ 
+    def extract_fields_batch(self, resume_texts: dict) -> dict:
+        """Parse several resumes ({id: text}) in one LLM request and return {id: fields}.
+ 
+        Cached resumes are served from the cache; any resume missing or malformed in
+        the batched reply falls back to a single extract_fields call.
+        """
+        results = {}
+        pending = {}
+        for resume_id, resume_text in resume_texts.items():
+            cleaned_text = self.clean_text(resume_text)
+            cache_key = make_cache_key(cleaned_text, self.model, self.system_prompt)
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached is not None:
+                print(f" Extraction cache hit: {resume_id}")
+                results[resume_id] = cached
+            else:
+                pending[resume_id] = (cleaned_text, cache_key)
+ 
+        if len(pending) > 1:
+            batch_ids = {f"R{i + 1}": resume_id for i, resume_id in enumerate(pending)}
+            user_content = "\n\n".join(
+                f"### RESUME {batch_id}\n{pending[resume_id][0]}" for batch_id, resume_id in batch_ids.items()
+            )
+            try:
+                messages = [
+                    {"role": "system", "content": self.system_prompt + self._build_batch_instructions()},
+                    {"role": "user", "content": user_content}
+                ]
+                response = self.client.chat_completion(
+                    messages=messages,
+                    max_tokens=None,
+                    temperature=0.0,
+                    top_p=1.0
+                )
+                raw_output = response.choices[0].message.content.strip()
+                print(f"\n Raw batched LLM Output ({len(batch_ids)} resumes):\n", raw_output)
+ 
+                json_start = raw_output.find('{')
+                json_end = raw_output.rfind('}')
+                parsed = json.loads(raw_output[json_start:json_end+1]) if json_start != -1 and json_end != -1 else {}
+ 
+                for batch_id, resume_id in batch_ids.items():
+                    value = parsed.get(batch_id) if isinstance(parsed, dict) else None
+                    if not isinstance(value, dict):
+                        continue
+                    value = self._ensure_required_keys(value)
+                    # Nothing usable for this resume: leave it to the single-request fallback
+                    if not self._has_fields(value):
+                        continue
+                    _, cache_key = pending.pop(resume_id)
+                    if self.cache:
+                        self.cache.put(cache_key, value)
+                    results[resume_id] = value
+            except Exception as e:
+                print(f" Batched extraction failed, falling back to single requests: {e}")
+ 
+        # Single-resume fallback for leftovers and malformed batch entries
+        for resume_id in list(pending):
+            if len(resume_texts) > 1:
+                print(f" Falling back to single extraction for: {resume_id}")
+            results[resume_id] = self.extract_fields(resume_texts[resume_id])
+ 
+        return results
+ 
     def save_to_json(self, data: dict, output_dir: str, original_file: str):
         if not data or all(not v for v in data.values()):
             print(" Skipping save: No valid JSON returned.")
@@ -150,37 +248,12 @@ Strict Rules:
             with open(output_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2)
             print(f" Saved: {output_path}")
+            return output_path
         except Exception as e:
             print(f" Failed to save {output_path}: {e}")
  
     def extract_text_from_file(self, file_path: str) -> str:
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".pdf":
-            try:
-                doc = fitz.open(file_path)
-                texts = []
-                for page in doc:
-                    text = page.get_text()
-                    if not text.strip():
-                        blocks = page.get_text("blocks")
-                        text = "\n".join(
-                            b[4].strip() for b in sorted(blocks, key=lambda b: (b[1], b[0])) if b[4].strip()
-                        )
-                    texts.append(text.strip())
-                return " ".join(texts)
-            except Exception as e:
-                print(f" Error reading PDF {file_path}: {e}")
-                return ""
-        elif ext == ".docx":
-            try:
-                doc = Document(file_path)
-                return " ".join(para.text.strip() for para in doc.paragraphs if para.text.strip())
-            except Exception as e:
-                print(f" Error reading DOCX {file_path}: {e}")
-                return ""
-        else:
-            print(f"Unsupported file format: {file_path}")
-            return ""
+        return extract_text_from_file(file_path)
  
  
 #  Clear old JSON files  
@@ -198,26 +271,84 @@ def clear_json_folder(folder_path):
         os.makedirs(folder_path)
  
  
+def list_resume_files(input_path: str):
+    """Resume files at input_path (a file or a folder), or None when the path does not exist."""
+    if os.path.isfile(input_path):
+        return [input_path] if input_path.lower().endswith((".pdf", ".docx")) else []
+    if os.path.isdir(input_path):
+        return [os.path.join(input_path, f) for f in os.listdir(input_path)
+                if f.lower().endswith((".pdf", ".docx"))]
+    print(f" Invalid path: {input_path}")
+    return None
+ 
+ 
 #  Main resume parsing logic
-def process_resumes(input_path: str, output_dir: str):
-    parser = LLMResumeParser()
+def process_resumes(input_path: str, output_dir: str, manifest=None, batch_size=EXTRACTION_BATCH_SIZE, persist=None):
+    """Parse every resume at input_path and return {file_path: fields} for the embedding stage.
  
-    clear_json_folder(output_dir)
+    JSON copies go to output_dir as `persist` says (see extraction.persistence); incremental runs write them inline.
+    """
+    parser = LLMResumeParser()
+    persister = JsonPersister(parser, output_dir, mode="sync" if manifest is not None else (persist or EXTRACTION_JSON_PERSIST))
+    records = {}
  
-    if os.path.isfile(input_path):
-        files = [input_path] if input_path.lower().endswith((".pdf", ".docx")) else []
-    elif os.path.isdir(input_path):
-        files = [os.path.join(input_path, f) for f in os.listdir(input_path)
-                 if f.lower().endswith((".pdf", ".docx"))]
+    # Incremental runs keep earlier JSON outputs and only re-extract new or modified files
+    if manifest is None:
+        clear_json_folder(output_dir)
     else:
-        print(f" Invalid path: {input_path}")
-        return
+        os.makedirs(output_dir, exist_ok=True)
+ 
+    files = list_resume_files(input_path)
+    if files is None:
+        return records
  
-    for file_path in files:
+    hashes = {}
+    if manifest is not None:
+        hashes = select_changed_sources(manifest, files, output_dir)
+        files = list(hashes)
+ 
+    def save(file_path, parsed, elapsed, batch=1):
+        ok = bool(parsed) and any(parsed.values())
+        metrics.record_document("llm_extraction", file_path, elapsed, "ok" if ok else "failed", batch=batch)
+        if not ok:
+            print(" Skipping save: No valid JSON returned.")
+            if manifest is not None:
+                discard_extraction(manifest, file_path, output_dir)
+            return
+        records[file_path] = parsed
+        output_path = persister.save(parsed, file_path)
+        if manifest is not None and output_path:
+            manifest.record("extracted", os.path.basename(file_path),
+                            hash=hashes[file_path], json=os.path.basename(output_path))
+ 
+    def save_batch(batch):
+        # Batched requests share one latency; each resume is charged its share
+        start = time.perf_counter()
+        results = parser.extract_fields_batch(batch)
+        elapsed = (time.perf_counter() - start) / len(batch)
+        for batch_path, parsed in results.items():
+            save(batch_path, parsed, elapsed, batch=len(batch))
+ 
+    batch = {}
+    for file_path, text in iter_extracted_texts(files):
         print(f"\n Processing: {file_path}")
-        text = parser.extract_text_from_file(file_path)
         if not text.strip():
             print(f" Skipped empty or unreadable file: {file_path}")
+            if manifest is not None:
+                discard_extraction(manifest, file_path, output_dir)
+            continue
+        if batch_size <= 1:
+            start = time.perf_counter()
+            parsed = parser.extract_fields(text)
+            save(file_path, parsed, time.perf_counter() - start)
             continue
-        parsed = parser.extract_fields(text)
-        parser.save_to_json(parsed, output_dir, file_path)
\ No newline at end of file
+        batch[file_path] = text
+        if len(batch) >= batch_size:
+            save_batch(batch)
+            batch = {}
+ 
+    if batch:
+        save_batch(batch)
+ 
+    persister.close()
+    return records
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+TEXT_EXTRACTION_WORKERS = int(os.getenv("TEXT_EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1
+
+# One process pool per process, started on first use and reused by every run
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps the workers clear of locks held by the parent's threads (torch, HTTP clients)
+            context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=TEXT_EXTRACTION_WORKERS, mp_context=context)
+        return _pool
+
+def shutdown_pool(wait=True):
+    """Stop the shared pool's workers; the next extraction starts a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def extract_text_from_file(file_path: str) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        try:
+            import fitz  # PyMuPDF, imported on first use to keep worker startup light
+            doc = fitz.open(file_path)
+            texts = []
+            for page in doc:
+                text = page.get_text()
+                if not text.strip():
+                    blocks = page.get_text("blocks")
+                    text = "\n".join(
+                        b[4].strip() for b in sorted(blocks, key=lambda b: (b[1], b[0])) if b[4].strip()
+                    )
+                texts.append(text.strip())
+            return " ".join(texts)
+        except Exception as e:
+            print(f" Error reading PDF {file_path}: {e}")
+            return ""
+    elif ext == ".docx":
+        try:
+            from docx import Document
+            doc = Document(file_path)
+            return " ".join(para.text.strip() for para in doc.paragraphs if para.text.strip())
+        except Exception as e:
+            print(f" Error reading DOCX {file_path}: {e}")
+            return ""
+    elif ext == ".txt":
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except Exception as e:
+            print(f" Error reading TXT {file_path}: {e}")
+            return ""
+    else:
+        print(f"Unsupported file format: {file_path}")
+        return ""
+
+
+def timed_extract_text(file_path: str):
+    """extract_text_from_file plus its duration; runs inside the pool workers."""
+    start = time.perf_counter()
+    text = extract_text_from_file(file_path)
+    return text, time.perf_counter() - start
+
+
+def iter_extracted_texts(files, max_workers=None):
+    """Yield (file_path, text) for each file as soon as its text is extracted.
+
+    Parsing runs on the shared process pool (get_pool), sized to the host's cores, so
+    CPU-bound PDFs do not hold up the LLM calls consuming the results. A single file,
+    or max_workers=1, is parsed inline. Order is completion order.
+    """
+    files = list(files)
+    workers = min(max_workers or TEXT_EXTRACTION_WORKERS, len(files))
+    if workers <= 1:
+        for file_path in files:
+            text, elapsed = timed_extract_text(file_path)
+            metrics.record_document("text_extraction", file_path, elapsed, "ok" if text.strip() else "empty")
+            yield file_path, text
+        return
+
+    try:
+        executor = get_pool()
+        futures = {executor.submit(timed_extract_text, file_path): file_path for file_path in files}
+    except BrokenProcessPool:
+        # A worker died in an earlier run; start over with a fresh pool
+        shutdown_pool(wait=False)
+        executor = get_pool()
+        futures = {executor.submit(timed_extract_text, file_path): file_path for file_path in files}
+    try:
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                text, elapsed = future.result()
+                metrics.record_document("text_extraction", file_path, elapsed, "ok" if text.strip() else "empty")
+            except Exception as e:
+                print(f" Text extraction worker failed for {file_path}: {e}")
+                metrics.record_document("text_extraction", file_path, 0.0, "failed")
+                text = ""
+            yield file_path, text
+    finally:
+        # The pool outlives this call; drop whatever a consumer that stopped early left queued
+        for future in futures:
+            future.cancel()
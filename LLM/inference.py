@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+import metrics
+load_dotenv()
+
+HF_TOKEN = os.getenv("TOKEN")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+# Which backend serves chat completions: "hf" (Hugging Face Inference API),
+# "openai" (any OpenAI-compatible server, e.g. a local vLLM/llama.cpp) or "replay" (recorded fixtures)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf").lower()
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:8080/v1")
+LLM_FIXTURES_DIR = os.getenv("LLM_FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "llm"))
+# Record every live response into LLM_FIXTURES_DIR so it can be replayed later
+LLM_RECORD_FIXTURES = os.getenv("LLM_RECORD_FIXTURES", "0") == "1"
+# Simulated latency of the replay backend, in seconds (mean and +/- jitter)
+LLM_REPLAY_LATENCY = float(os.getenv("LLM_REPLAY_LATENCY", "0"))
+LLM_REPLAY_JITTER = float(os.getenv("LLM_REPLAY_JITTER", "0"))
+
+# Request budget shared by every caller of the same model; 0 disables a limit
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "8"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class TokenBucket:
+    """Blocking token bucket; `rate` tokens are added per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1.0):
+        if self.rate <= 0:
+            return
+        # A request larger than the bucket waits for a full bucket and then goes into debt,
+        # so the callers after it wait until the excess has been refilled
+        needed = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and rejects calls until `cooldown` has passed.
+
+    After the cooldown one trial call is let through (half-open); its outcome closes or re-opens the circuit.
+    Other callers block until that outcome is known rather than spending a retry on it.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.trial_owner = None
+        self._lock = threading.Lock()
+        self._trial_done = threading.Condition(self._lock)
+
+    def before_call(self):
+        """Return 0 if a call may go ahead, otherwise the seconds to wait before asking again."""
+        with self._lock:
+            while self.trial_in_flight:
+                self._trial_done.wait()
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                return remaining
+            self.trial_in_flight = True
+            self.trial_owner = threading.get_ident()
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+            self._trial_done.notify_all()
+
+    def release_trial(self):
+        """Give up the trial without a verdict; a no-op for callers that were not the trial."""
+        with self._lock:
+            if self.trial_in_flight and self.trial_owner == threading.get_ident():
+                self.trial_in_flight = False
+                self._trial_done.notify_all()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.threshold > 0 and (self.failures >= self.threshold or self.opened_at is not None):
+                self.opened_at = time.monotonic()
+            self._trial_done.notify_all()
+
+def estimate_tokens(messages, max_tokens=None):
+    # Rough budget: ~4 characters per token for the prompt, plus the completion allowance
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars / 4 + (max_tokens or 0)
+
+def get_status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+def get_retry_after(error):
+    """Seconds to wait according to the Retry-After header, if the server sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+def is_retryable(error):
+    status = get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # No HTTP response at all: treat timeouts and dropped connections as transient
+    name = type(error).__name__.lower()
+    return isinstance(error, (TimeoutError, ConnectionError)) or "timeout" in name or "connection" in name
+
+def make_response(content):
+    """Minimal stand-in for ChatCompletionOutput: call sites only read choices[0].message.content."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def make_fixture_key(model, messages, params):
+    payload = json.dumps({"model": model or "", "messages": messages, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class HFBackend:
+    """Hugging Face Inference API (the original behaviour)."""
+
+    def __init__(self, model, token=HF_TOKEN, timeout=LLM_TIMEOUT):
+        from huggingface_hub import InferenceClient
+        self.client = InferenceClient(model=model, token=token, timeout=timeout)
+
+    def chat_completion(self, messages, **params):
+        return self.client.chat_completion(messages=messages, **params)
+
+class OpenAICompatibleBackend:
+    """POSTs to `<base_url>/chat/completions` of an OpenAI-compatible server."""
+
+    def __init__(self, model, base_url=LLM_BASE_URL, token=HF_TOKEN, timeout=LLM_TIMEOUT):
+        import requests
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def chat_completion(self, messages, **params):
+        response = self.session.post(
+            self.url, json={"model": self.model, "messages": messages, **params}, timeout=self.timeout
+        )
+        # HTTPError carries .response, so status codes and Retry-After reach the retry logic
+        response.raise_for_status()
+        return make_response(response.json()["choices"][0]["message"]["content"])
+
+class FixtureMissingError(LookupError):
+    pass
+
+class ReplayBackend:
+    """Serves responses recorded with LLM_RECORD_FIXTURES=1, after a simulated latency.
+
+    Fixtures are keyed on the model, messages and sampling parameters, so a replayed
+    run issues exactly the requests the recorded run did. No network access is needed.
+    """
+
+    def __init__(self, model, fixtures_dir=LLM_FIXTURES_DIR, latency=LLM_REPLAY_LATENCY, jitter=LLM_REPLAY_JITTER):
+        self.model = model
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+
+    def chat_completion(self, messages, **params):
+        key = make_fixture_key(self.model, messages, params)
+        path = os.path.join(self.fixtures_dir, f"{key}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except FileNotFoundError:
+            raise FixtureMissingError(f"No recorded LLM response {path}")
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return make_response(content)
+
+class RecordingBackend:
+    """Passes calls through to `backend` and stores each response as a replay fixture."""
+
+    def __init__(self, backend, model, fixtures_dir=LLM_FIXTURES_DIR):
+        self.backend = backend
+        self.model = model
+        self.fixtures_dir = fixtures_dir
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+
+    def chat_completion(self, messages, **params):
+        response = self.backend.chat_completion(messages, **params)
+        key = make_fixture_key(self.model, messages, params)
+        path = os.path.join(self.fixtures_dir, f"{key}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "messages": messages, "params": params,
+                           "content": response.choices[0].message.content}, f, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[WARNING] Could not record LLM fixture {path}: {e}")
+        return response
+
+BACKENDS = {
+    "hf": HFBackend,
+    "openai": OpenAICompatibleBackend,
+    "replay": ReplayBackend,
+}
+
+def create_backend(model, backend=LLM_BACKEND, record=LLM_RECORD_FIXTURES):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of: {', '.join(BACKENDS)}")
+    instance = BACKENDS[backend](model)
+    if record and backend != "replay":
+        instance = RecordingBackend(instance, model)
+    return instance
+
+class RateLimitedClient:
+    """Drop-in wrapper around the configured backend's chat_completion, shared by the extraction parsers and compare.llm.
+
+    Every call waits for the requests-per-second and tokens-per-minute budgets, retries
+    429/5xx/network errors with exponential backoff and full jitter (or the server's
+    Retry-After), and goes through a circuit breaker: while it is open, callers wait out
+    the cooldown, and then the half-open trial call, instead of hammering a failing endpoint.
+    """
+
+    def __init__(self, model, backend=None,
+                 requests_per_second=LLM_REQUESTS_PER_SECOND, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX,
+                 breaker_threshold=LLM_BREAKER_THRESHOLD, breaker_cooldown=LLM_BREAKER_COOLDOWN):
+        self.model = model
+        self.client = backend or create_backend(model)
+        self.request_bucket = TokenBucket(requests_per_second, max(1.0, requests_per_second))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def record_usage(self, messages, response):
+        # Prefer the server's usage block; fall back to the same character estimate the token bucket uses
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = int(estimate_tokens(messages))
+        if completion_tokens is None:
+            content = response.choices[0].message.content or ""
+            completion_tokens = len(content) // 4
+        metrics.inc("llm_prompt_tokens_total", prompt_tokens, model=self.model)
+        metrics.inc("llm_completion_tokens_total", completion_tokens, model=self.model)
+
+    def chat_completion(self, messages, **params):
+        estimated_tokens = estimate_tokens(messages, params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            wait = self.breaker.before_call()
+            if wait:
+                if attempt == self.max_retries:
+                    metrics.inc("llm_requests_total", model=self.model, outcome="circuit_open")
+                    raise CircuitOpenError(f"LLM circuit open for model '{self.model}'")
+                print(f"[WARNING] LLM circuit open, waiting {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            with metrics.timed("llm_rate_limit_wait_seconds", model=self.model):
+                self.request_bucket.acquire(1)
+                self.token_bucket.acquire(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                response = self.client.chat_completion(messages=messages, **params)
+            except Exception as e:
+                metrics.observe("llm_request_seconds", time.perf_counter() - start, model=self.model)
+                if not is_retryable(e):
+                    metrics.inc("llm_requests_total", model=self.model, outcome="error")
+                    # Not a transient failure: an HTTP answer still proves the endpoint is up
+                    if get_status_code(e) is not None:
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.release_trial()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    metrics.inc("llm_requests_total", model=self.model, outcome="error")
+                    raise
+                metrics.inc("llm_requests_total", model=self.model, outcome="retry")
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                delay = min(delay, self.backoff_max)
+                print(f"[WARNING] LLM call failed ({get_status_code(e) or type(e).__name__}), "
+                      f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Interrupted mid-call: never leave the waiters blocked on a trial with no outcome
+                self.breaker.release_trial()
+                raise
+            metrics.observe("llm_request_seconds", time.perf_counter() - start, model=self.model)
+            metrics.inc("llm_requests_total", model=self.model, outcome="ok")
+            self.breaker.record_success()
+            try:
+                self.record_usage(messages, response)
+            except Exception as e:
+                print(f"[WARNING] Could not record LLM token usage: {e}")
+            return response
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_inference_client(model_name=None):
+    """Process-wide RateLimitedClient per model, so all call sites share one budget."""
+    model_name = model_name or os.getenv("MODEL_NAME")
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            client = RateLimitedClient(model_name)
+            _clients[model_name] = client
+    return client
+
+def use_backend(backend, model_name=None):
+    """Route every later get_inference_client(model_name) call to `backend`, e.g. a benchmark's mock LLM."""
+    model_name = model_name or os.getenv("MODEL_NAME")
+    client = RateLimitedClient(model_name, backend=backend)
+    with _clients_lock:
+        _clients[model_name] = client
+    return client
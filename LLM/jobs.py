@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import uuid
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "resume_shortlister", "jobs"))
+
+class JobStore:
+    """Pipeline job records kept in memory and mirrored to one JSON file per job.
+
+    A job moves queued -> running -> completed | failed; each pipeline stage is
+    tracked separately under `stages`. Results are stored next to the job record
+    so finished jobs survive a server restart.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, stages=()):
+        self.jobs_dir = jobs_dir
+        self.stages = list(stages)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _results_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.results.json")
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _save(self, job):
+        try:
+            self._write(self._job_path(job["job_id"]), job)
+        except Exception as e:
+            print(f"[WARNING] Could not persist job {job['job_id']}: {e}")
+
+    def create(self, **meta):
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "stages": {name: {"status": "pending", "elapsed": None} for name in self.stages},
+            **meta,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                try:
+                    with open(self._job_path(job_id), "r", encoding="utf-8") as f:
+                        job = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    return None
+                # Only jobs of an earlier server process are read from disk; one that never
+                # finished there will not finish now
+                if job.get("status") in ("queued", "running"):
+                    job.update(status="failed", finished_at=time.time(), error="Job interrupted by server restart")
+                    self._save(job)
+                self._jobs[job_id] = job
+            return json.loads(json.dumps(job))
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            self._save(job)
+
+    def start(self, job_id):
+        self._update(job_id, status="running", started_at=time.time())
+
+    def update_stage(self, job_id, stage, status, elapsed=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["stages"][stage] = {"status": status, "elapsed": round(elapsed, 3) if elapsed is not None else None}
+            self._save(job)
+
+    def complete(self, job_id, results):
+        try:
+            self._write(self._results_path(job_id), results)
+        except Exception as e:
+            self.fail(job_id, f"Could not store results: {e}")
+            return
+        self._update(job_id, status="completed", finished_at=time.time(), result_count=len(results))
+
+    def fail(self, job_id, error):
+        self._update(job_id, status="failed", finished_at=time.time(), error=str(error))
+
+    def get_results(self, job_id):
+        try:
+            with open(self._results_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
@@ -3,25 +3,56 @@ import time
 import traceback
 from extraction.resume_extraction import process_resumes as extract_all_resumes
 from extraction.jd_extraction import process_jds as extract_all_jds
-from embedding.resume_embedding import embed_all_jsons_from_folder as embed_resumes
-from embedding.jd_embedding import embed_all_jsons_from_folder as embed_jds
-from compare.llm import main as run_llm_comparison
+from embedding.resume_embedding import embed_all_jsons_from_folder as embed_resumes, embed_records as embed_resume_records
+from embedding.jd_embedding import embed_all_jsons_from_folder as embed_jds, embed_records as embed_jd_records
+from compare.llm import main as run_llm_comparison, stream as stream_llm_comparison, compare_records, stream_records
+from embedding import chroma_sink
+from manifest import Manifest
+from pipeline import OverlappedPipeline
+import metrics
 
-def timed_step(step_name, func, *args, **kwargs):
+# Incremental runs only process new or modified documents (see manifest.Manifest)
+PIPELINE_INCREMENTAL = os.getenv("PIPELINE_INCREMENTAL", "0") == "1"
+# Stream each resume through extraction, embedding and comparison (see pipeline.OverlappedPipeline);
+# incremental runs always use the staged path, whose stages consult the manifest
+PIPELINE_OVERLAP = os.getenv("PIPELINE_OVERLAP", "1") == "1"
+
+PIPELINE_STAGES = [
+    "Resume Extraction",
+    "JD Extraction",
+    "Resume Embedding",
+    "JD Embedding",
+    "LLM-Based Comparison",
+]
+
+def timed_step(step_name, func, *args, progress=None, **kwargs):
+    """Run one pipeline stage; `progress(step_name, status, elapsed)` is told when it starts and ends."""
     print(f"\n[STEP] {step_name}...")
     start = time.time()
+    if progress:
+        progress(step_name, "running", 0.0)
     try:
         result = func(*args, **kwargs)
-        print(f"[DONE] {step_name} in {time.time() - start:.2f}s")
+        elapsed = time.time() - start
+        print(f"[DONE] {step_name} in {elapsed:.2f}s")
+        metrics.record_stage(step_name, "done", elapsed)
+        if progress:
+            progress(step_name, "done", elapsed)
         return result
     except Exception as e:
         print(f"[ERROR] {step_name} failed: {e}")
         traceback.print_exc()
+        metrics.record_stage(step_name, "failed", time.time() - start, error=str(e))
+        if progress:
+            progress(step_name, "failed", time.time() - start)
         return None
 
-def main(resume_folder, jd_folder):
-    print("\n=== Starting Resume Shortlisting Pipeline ===")
+def prepare(resume_folder, jd_folder, progress=None, incremental=PIPELINE_INCREMENTAL):
+    """Run extraction and embedding; returns what the comparison works from for (resume, JD).
 
+    That is the in-memory (texts, embeddings, metadatas) of each side, or the Chroma
+    directories for incremental runs (see compare_function).
+    """
     resume_json = os.path.join(resume_folder, "json_resume")
     jd_json = os.path.join(jd_folder, "json_jd")
 
@@ -33,12 +64,59 @@ def main(resume_folder, jd_folder):
     os.makedirs(chroma_resume, exist_ok=True)
     os.makedirs(chroma_jd, exist_ok=True)
 
-    timed_step("Resume Extraction", extract_all_resumes, resume_folder, resume_json)
-    timed_step("JD Extraction", extract_all_jds, jd_folder, jd_json)
-    timed_step("Resume Embedding", embed_resumes, resume_json, chroma_resume)
-    timed_step("JD Embedding", embed_jds, jd_json, chroma_jd)
+    if not incremental:
+        # Parsed records go straight to embedding and embedded fields straight to the comparison;
+        # the JSON folders and Chroma are written on the side (EXTRACTION_JSON_PERSIST, CHROMA_PERSIST)
+        resume_records = timed_step("Resume Extraction", extract_all_resumes, resume_folder, resume_json, progress=progress)
+        jd_records = timed_step("JD Extraction", extract_all_jds, jd_folder, jd_json, progress=progress)
+        resume_embedded = timed_step("Resume Embedding", embed_resume_records, resume_records or {}, chroma_resume, progress=progress)
+        jd_embedded = timed_step("JD Embedding", embed_jd_records, jd_records or {}, chroma_jd, progress=progress)
+        return resume_embedded or ([], [], []), jd_embedded or ([], [], [])
+
+    # Incremental runs work from the JSON folders and Chroma, which the manifests describe;
+    # background writes of earlier runs must have landed first
+    chroma_sink.flush()
+    resume_manifest = Manifest.for_folder(resume_folder)
+    jd_manifest = Manifest.for_folder(jd_folder)
+
+    timed_step("Resume Extraction", extract_all_resumes, resume_folder, resume_json, manifest=resume_manifest, progress=progress)
+    timed_step("JD Extraction", extract_all_jds, jd_folder, jd_json, manifest=jd_manifest, progress=progress)
+    timed_step("Resume Embedding", embed_resumes, resume_json, chroma_resume, manifest=resume_manifest, progress=progress)
+    timed_step("JD Embedding", embed_jds, jd_json, chroma_jd, manifest=jd_manifest, progress=progress)
+
+    for manifest in (resume_manifest, jd_manifest):
+        manifest.save()
+
+    return chroma_resume, chroma_jd
 
-    results = timed_step("LLM-Based Comparison", run_llm_comparison, chroma_resume, chroma_jd)
+def compare_function(incremental, streaming=False):
+    """The comparison matching what prepare returned for this kind of run."""
+    if incremental:
+        return stream_llm_comparison if streaming else run_llm_comparison
+    return stream_records if streaming else compare_records
+
+def main(resume_folder, jd_folder, progress=None, incremental=PIPELINE_INCREMENTAL, run_id=None, flush_chroma=True):
+    """Run the pipeline and return its comparison results.
+
+    With flush_chroma the call returns once the background Chroma writes of the run have landed;
+    the API server passes False and flushes on shutdown instead (see embedding.chroma_sink).
+    """
+    # Stage, per-document and cache metrics of this run are saved as a JSON report (see metrics.run_report)
+    with metrics.run_report(run_id):
+        try:
+            return run(resume_folder, jd_folder, progress=progress, incremental=incremental)
+        finally:
+            if flush_chroma:
+                chroma_sink.flush()
+
+def run(resume_folder, jd_folder, progress=None, incremental=PIPELINE_INCREMENTAL, overlap=PIPELINE_OVERLAP):
+    print("\n=== Starting Resume Shortlisting Pipeline ===")
+
+    if overlap and not incremental:
+        results = list(OverlappedPipeline(resume_folder, jd_folder, progress=progress).run())
+    else:
+        resume_source, jd_source = prepare(resume_folder, jd_folder, progress=progress, incremental=incremental)
+        results = timed_step("LLM-Based Comparison", compare_function(incremental), resume_source, jd_source, progress=progress)
     print("[RESULTS] LLM Comparison Results:")
     if results:
         for result in results:
@@ -48,4 +126,53 @@ def main(resume_folder, jd_folder):
     if not results or not isinstance(results, list):
         raise RuntimeError("LLM did not return valid results")
 
-    return results
\ No newline at end of file
+    return results
+
+def stream(resume_folder, jd_folder, progress=None, incremental=PIPELINE_INCREMENTAL, run_id=None, flush_chroma=True):
+    """Same pipeline as main, but yields each comparison result as soon as it is parsed."""
+    with metrics.run_report(run_id):
+        try:
+            yield from run_streaming(resume_folder, jd_folder, progress=progress, incremental=incremental)
+        finally:
+            if flush_chroma:
+                chroma_sink.flush()
+
+def run_streaming(resume_folder, jd_folder, progress=None, incremental=PIPELINE_INCREMENTAL, overlap=PIPELINE_OVERLAP):
+    print("\n=== Starting Resume Shortlisting Pipeline (streaming) ===")
+
+    if overlap and not incremental:
+        count = 0
+        for result in OverlappedPipeline(resume_folder, jd_folder, progress=progress).run():
+            count += 1
+            yield result
+        print("\n=== Pipeline Completed ===")
+        if not count:
+            raise RuntimeError("LLM did not return valid results")
+        return
+
+    resume_source, jd_source = prepare(resume_folder, jd_folder, progress=progress, incremental=incremental)
+
+    step_name = "LLM-Based Comparison"
+    print(f"\n[STEP] {step_name}...")
+    start = time.time()
+    if progress:
+        progress(step_name, "running", 0.0)
+
+    count = 0
+    try:
+        for result in compare_function(incremental, streaming=True)(resume_source, jd_source):
+            count += 1
+            yield result
+    except Exception as e:
+        metrics.record_stage(step_name, "failed", time.time() - start, error=str(e))
+        if progress:
+            progress(step_name, "failed", time.time() - start)
+        raise
+
+    print(f"[DONE] {step_name} in {time.time() - start:.2f}s")
+    metrics.record_stage(step_name, "done", time.time() - start)
+    if progress:
+        progress(step_name, "done", time.time() - start)
+    print("\n=== Pipeline Completed ===")
+    if not count:
+        raise RuntimeError("LLM did not return valid results")
@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+import threading
+
+MANIFEST_NAME = "manifest.json"
+
+def file_hash(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class Manifest:
+    """Per-folder record of what the pipeline has already processed, used by incremental runs.
+
+    Layout of the JSON file:
+        "extracted": {source file name: {"hash": <source sha256>, "json": <output JSON name>}}
+        "embedded":  {JSON file name:   {"hash": <JSON sha256>, "doc_id": <Chroma doc_id>, "ids": [<record ids>]}}
+
+    Comparisons are not listed here: they are keyed on the field texts themselves
+    in the comparison cache, so an unchanged resume/JD pair is a cache hit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"extracted": {}, "embedded": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                for section in self.data:
+                    self.data[section].update(loaded.get(section, {}))
+            except Exception as e:
+                print(f"[WARNING] Ignoring unreadable manifest {path}: {e}")
+
+    @classmethod
+    def for_folder(cls, folder):
+        return cls(os.path.join(folder, MANIFEST_NAME))
+
+    def get(self, section, name):
+        with self._lock:
+            return self.data[section].get(name)
+
+    def names(self, section):
+        with self._lock:
+            return list(self.data[section])
+
+    def record(self, section, name, **entry):
+        with self._lock:
+            self.data[section][name] = entry
+
+    def forget(self, section, name):
+        with self._lock:
+            return self.data[section].pop(name, None)
+
+    def is_current(self, section, name, content_hash):
+        entry = self.get(section, name)
+        return bool(entry) and entry.get("hash") == content_hash
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"[WARNING] Could not save manifest {self.path}: {e}")
+
+def select_changed_sources(manifest, files, output_dir):
+    """Incremental extraction: return {file_path: hash} of sources that are new or modified.
+
+    Sources that disappeared since the last run have their JSON output removed.
+    """
+    current = {os.path.basename(f) for f in files}
+    for name in manifest.names("extracted"):
+        if name not in current:
+            entry = manifest.forget("extracted", name)
+            json_path = os.path.join(output_dir, entry.get("json", ""))
+            if entry.get("json") and os.path.exists(json_path):
+                os.remove(json_path)
+                print(f" Removed JSON of deleted source: {json_path}")
+
+    changed = {}
+    for file_path in files:
+        name = os.path.basename(file_path)
+        content_hash = file_hash(file_path)
+        entry = manifest.get("extracted", name)
+        if (manifest.is_current("extracted", name, content_hash)
+                and os.path.exists(os.path.join(output_dir, entry.get("json", "")))):
+            print(f" Unchanged, skipping: {file_path}")
+            continue
+        changed[file_path] = content_hash
+    return changed
+
+def discard_extraction(manifest, file_path, output_dir):
+    """Incremental extraction: a changed source failed to re-extract, so drop what its last run left.
+
+    Its JSON output goes too, so embedding cleanup and the comparison no longer see the old content.
+    """
+    entry = manifest.forget("extracted", os.path.basename(file_path))
+    if not entry or not entry.get("json"):
+        return
+    manifest.forget("embedded", entry["json"])
+    json_path = os.path.join(output_dir, entry["json"])
+    if os.path.exists(json_path):
+        os.remove(json_path)
+        print(f" Removed stale JSON of failed source: {json_path}")
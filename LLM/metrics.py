@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextlib
+import contextvars
+from dotenv import load_dotenv
+load_dotenv()
+
+METRICS_PREFIX = "shortlister_"
+# One JSON report per pipeline run is written here; set to an empty string to disable
+METRICS_REPORT_DIR = os.getenv(
+    "METRICS_REPORT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "resume_shortlister", "reports")
+)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_HELP = {
+    "pipeline_runs_total": ("counter", "Pipeline runs by final status"),
+    "stage_runs_total": ("counter", "Pipeline stage runs by status"),
+    "stage_seconds": ("histogram", "Wall time of each pipeline stage"),
+    "documents_total": ("counter", "Documents (or comparison pairs) processed per stage, by status"),
+    "document_seconds": ("histogram", "Per-document processing time per stage"),
+    "llm_requests_total": ("counter", "LLM requests by outcome (ok, retry, error, circuit_open)"),
+    "llm_request_seconds": ("histogram", "Latency of individual LLM requests"),
+    "llm_rate_limit_wait_seconds": ("histogram", "Time spent waiting for the LLM rate limiter"),
+    "llm_prompt_tokens_total": ("counter", "Prompt tokens sent to the LLM (server usage or estimate)"),
+    "llm_completion_tokens_total": ("counter", "Completion tokens returned by the LLM (server usage or estimate)"),
+    "cache_requests_total": ("counter", "Extraction and comparison cache lookups by result"),
+    "embedding_texts_total": ("counter", "Field texts encoded by the embedding model"),
+    "embedding_encode_seconds": ("histogram", "Time spent in SentenceTransformer.encode per call"),
+    "chroma_records_written_total": ("counter", "Field records upserted into Chroma"),
+    "chroma_write_seconds": ("histogram", "Time spent writing field records to Chroma per call"),
+    "warm_up_seconds": ("histogram", "Time taken by each server warm-up step"),
+}
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+
+        lines = []
+        names = sorted(set(name for name, _ in counters) | set(name for name, _ in histograms))
+        for name in names:
+            full_name = METRICS_PREFIX + name
+            kind, help_text = METRIC_HELP.get(name, ("histogram" if any(n == name for n, _ in histograms) else "counter", name))
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for (metric, key), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full_name}{_format_labels(key)} {value}")
+            for (metric, key), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{_format_labels(key, [('le', str(bound))])} {cumulative}")
+                lines.append(f"{full_name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {histogram['sum']:.6f}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+class RunReport:
+    """Everything recorded while one pipeline run was active: stage timings, per-document events and counters."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.finished_at = None
+        self.status = "running"
+        self.stages = {}
+        self.documents = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record_stage(self, stage, status, elapsed, error=None):
+        with self._lock:
+            self.stages[stage] = {"status": status, "elapsed": round(elapsed, 4), "error": error}
+
+    def record_document(self, stage, document, elapsed, status, extra):
+        with self._lock:
+            self.documents.append({"stage": stage, "document": document, "status": status,
+                                   "elapsed": round(elapsed, 4), **extra})
+
+    def add(self, name, amount, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def summarize_documents(self):
+        by_stage = {}
+        for event in self.documents:
+            by_stage.setdefault(event["stage"], []).append(event)
+        summary = {}
+        for stage, events in by_stage.items():
+            elapsed = [e["elapsed"] for e in events]
+            summary[stage] = {
+                "count": len(events),
+                "failed": sum(1 for e in events if e["status"] == "failed"),
+                "total_s": round(sum(elapsed), 4),
+                "p50_s": _percentile(elapsed, 50),
+                "p95_s": _percentile(elapsed, 95),
+                "max_s": max(elapsed),
+            }
+        return summary
+
+    def cache_hit_rates(self):
+        totals = {}
+        for (name, key), value in self.counters.items():
+            if name != "cache_requests_total":
+                continue
+            labels = dict(key)
+            hits, lookups = totals.get(labels.get("cache"), (0, 0))
+            totals[labels.get("cache")] = (hits + (value if labels.get("result") == "hit" else 0), lookups + value)
+        return {cache: round(hits / lookups, 4) for cache, (hits, lookups) in totals.items() if lookups}
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed": round((self.finished_at or time.time()) - self.started_at, 4),
+                "stages": dict(self.stages),
+                "document_summary": self.summarize_documents(),
+                "cache_hit_rates": self.cache_hit_rates(),
+                "counters": {name + _format_labels(key): value for (name, key), value in sorted(self.counters.items())},
+                "documents": list(self.documents),
+            }
+
+    def save(self, report_dir=METRICS_REPORT_DIR):
+        if not report_dir:
+            return None
+        path = os.path.join(report_dir, f"{self.run_id}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+            print(f"[INFO] Run report written to {path}")
+            return path
+        except Exception as e:
+            print(f"[WARNING] Could not write run report {path}: {e}")
+            return None
+
+registry = MetricsRegistry()
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+def current_run():
+    return _current_run.get()
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+    run = _current_run.get()
+    if run is not None:
+        run.add(name, amount, labels)
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+@contextlib.contextmanager
+def timed(name, **labels):
+    """Observe the wall time of the block into histogram `name`, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def record_document(stage, document, elapsed, status="ok", **extra):
+    """Per-document timing: goes to the document_* metrics and to the active run report."""
+    observe("document_seconds", elapsed, stage=stage)
+    inc("documents_total", stage=stage, status=status)
+    run = _current_run.get()
+    if run is not None:
+        run.record_document(stage, os.path.basename(str(document)), elapsed, status, extra)
+
+def record_stage(stage, status, elapsed, error=None):
+    observe("stage_seconds", elapsed, stage=stage)
+    inc("stage_runs_total", stage=stage, status=status)
+    run = _current_run.get()
+    if run is not None:
+        run.record_stage(stage, status, elapsed, error)
+
+def submit(executor, func, *args):
+    """executor.submit that keeps the caller's active run report, so worker threads record into it."""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+def start_thread(func, *args, name=None):
+    """Start a daemon thread running func(*args) that records into the caller's active run report."""
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(func, *args), name=name, daemon=True)
+    thread.start()
+    return thread
+
+@contextlib.contextmanager
+def run_report(run_id=None, report_dir=METRICS_REPORT_DIR):
+    """Collect a RunReport for the code inside the block and save it as JSON when the block exits."""
+    report = RunReport(run_id)
+    token = _current_run.set(report)
+    try:
+        yield report
+        report.status = "completed"
+    except BaseException:
+        report.status = "failed"
+        raise
+    finally:
+        _current_run.reset(token)
+        report.finished_at = time.time()
+        inc("pipeline_runs_total", status=report.status)
+        report.save(report_dir)
@@ -0,0 +1,403 @@
+import os
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import metrics
+from extraction.text_extraction import iter_extracted_texts
+from extraction.resume_extraction import EXTRACTION_BATCH_SIZE, LLMResumeParser, clear_json_folder, list_resume_files
+from extraction.jd_extraction import process_jds
+from extraction.persistence import JsonPersister
+from embedding import resume_embedding, jd_embedding, chroma_sink
+from compare import llm
+from compare.shortlist import SHORTLIST_TOP_K, SHORTLIST_THRESHOLD, group_field_vectors, shortlist, weighted_similarity
+load_dotenv()
+
+# Bounded hand-off between overlapped stages; a full queue makes the upstream stage wait
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+# Threads running LLM extraction of resumes in parallel
+PIPELINE_EXTRACTION_WORKERS = int(os.getenv("PIPELINE_EXTRACTION_WORKERS", "4"))
+
+_DONE = object()
+
+class OverlappedPipeline:
+    """Resumes flow text extraction -> LLM extraction -> embedding -> comparison one document at a time.
+
+    Each stage runs on its own thread(s) and hands documents to the next through a bounded
+    queue, so a resume is compared as soon as it is embedded instead of after the whole batch.
+    JDs are extracted and embedded first, on the calling thread, while the first resumes are
+    being parsed; comparisons wait for them. With a top-K shortlist the comparison stage needs
+    every resume's score, so it only starts once the last resume is embedded.
+    """
+
+    def __init__(self, resume_folder, jd_folder, progress=None, top_k=SHORTLIST_TOP_K, threshold=SHORTLIST_THRESHOLD,
+                 queue_size=PIPELINE_QUEUE_SIZE, extraction_workers=PIPELINE_EXTRACTION_WORKERS,
+                 extraction_batch_size=EXTRACTION_BATCH_SIZE, max_workers=None, group_size=None):
+        self.resume_folder = resume_folder
+        self.jd_folder = jd_folder
+        self.resume_json = os.path.join(resume_folder, "json_resume")
+        self.jd_json = os.path.join(jd_folder, "json_jd")
+        self.chroma_resume = os.path.join(resume_folder, "chroma_resume")
+        self.chroma_jd = os.path.join(jd_folder, "chroma_jd")
+        self.progress = progress
+        self.top_k = top_k
+        self.threshold = threshold
+        self.queue_size = max(1, queue_size)
+        self.extraction_workers = max(1, extraction_workers)
+        self.extraction_batch_size = max(1, extraction_batch_size)
+        self.max_workers = max(1, max_workers or llm.LLM_CONCURRENCY)
+        self.group_size = max(1, group_size or llm.COMPARE_GROUP_SIZE)
+
+        self.texts = queue.Queue(self.queue_size)
+        self.parsed = queue.Queue(self.queue_size)
+        self.embedded = queue.Queue(self.queue_size)
+        # Drained by the consumer as fast as it reads results, so it is not bounded
+        self.results = queue.Queue()
+
+        self.stop = threading.Event()
+        self.jd_ready = threading.Event()
+        self.jd_table = {}
+        self.jd_vectors = {}
+        self.parser = None
+        self.persister = None
+        self.parse_workers_left = self.extraction_workers
+        self.in_flight = 0
+        self.dispatch_done = False
+        self.stage_starts = {}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    # Stage bookkeeping, mirroring main.timed_step
+
+    def stage_started(self, name):
+        print(f"\n[STEP] {name}...")
+        self.stage_starts[name] = time.time()
+        if self.progress:
+            self.progress(name, "running", 0.0)
+
+    def stage_finished(self, name, error=None):
+        elapsed = time.time() - self.stage_starts.get(name, time.time())
+        if error is None:
+            print(f"[DONE] {name} in {elapsed:.2f}s")
+        metrics.record_stage(name, "failed" if error else "done", elapsed, error=str(error) if error else None)
+        if self.progress:
+            self.progress(name, "failed" if error else "done", elapsed)
+
+    def fail(self, name, error):
+        print(f"[ERROR] {name} failed: {error}")
+        traceback.print_exc()
+        with self._lock:
+            self.errors.append((name, error))
+
+    def put(self, q, item):
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    # Stages
+
+    def read_texts(self, files):
+        try:
+            for file_path, text in iter_extracted_texts(files):
+                if not text.strip():
+                    print(f" Skipped empty or unreadable file: {file_path}")
+                    continue
+                if not self.put(self.texts, (file_path, text)):
+                    break
+        except Exception as e:
+            self.fail("Resume Extraction", e)
+        finally:
+            for _ in range(self.extraction_workers):
+                self.put(self.texts, _DONE)
+
+    def parse_resumes(self):
+        error = None
+        try:
+            finished = False
+            while not finished:
+                item = self.get(self.texts)
+                if item is _DONE:
+                    break
+                # Batch whatever is already waiting, up to EXTRACTION_BATCH_SIZE, like process_resumes does
+                batch = [item]
+                while len(batch) < self.extraction_batch_size:
+                    try:
+                        item = self.texts.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        finished = True
+                        break
+                    batch.append(item)
+                try:
+                    if not self.parse_batch(batch):
+                        break
+                except Exception as e:
+                    # One bad batch costs its own resumes, not the rest of the stage
+                    print(f"[ERROR] Resume Extraction failed for {', '.join(path for path, _ in batch)}: {e}")
+                    traceback.print_exc()
+                    for file_path, _ in batch:
+                        metrics.record_document("llm_extraction", file_path, 0.0, "failed", batch=len(batch))
+        except Exception as e:
+            error = e
+            self.fail("Resume Extraction", e)
+        finally:
+            with self._lock:
+                self.parse_workers_left -= 1
+                last = self.parse_workers_left == 0
+            if last:
+                self.stage_finished("Resume Extraction", error)
+                self.put(self.parsed, _DONE)
+
+    def parse_batch(self, batch):
+        """Extract a batch of (file_path, text); returns False once the pipeline is stopping."""
+        for file_path, _ in batch:
+            print(f"\n Processing: {file_path}")
+        start = time.perf_counter()
+        if len(batch) == 1:
+            file_path, text = batch[0]
+            results = {file_path: self.parser.extract_fields(text)}
+        else:
+            results = self.parser.extract_fields_batch(dict(batch))
+        # Batched requests share one latency; each resume is charged its share
+        elapsed = (time.perf_counter() - start) / len(batch)
+
+        for file_path, _ in batch:
+            parsed = results.get(file_path)
+            ok = bool(parsed) and any(parsed.values())
+            metrics.record_document("llm_extraction", file_path, elapsed, "ok" if ok else "failed", batch=len(batch))
+            if not ok:
+                continue
+            self.persister.save(parsed, file_path)
+            if not self.put(self.parsed, (file_path, parsed)):
+                return False
+        return True
+
+    def embed_resumes(self):
+        error = None
+        try:
+            finished = False
+            while not finished:
+                item = self.get(self.parsed)
+                if item is _DONE:
+                    break
+                # Encode everything already waiting together, like the bulk embedder does
+                batch = [item]
+                while len(batch) < self.queue_size:
+                    try:
+                        item = self.parsed.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        finished = True
+                        break
+                    batch.append(item)
+                try:
+                    self.embed_batch(batch)
+                except Exception as e:
+                    print(f"[ERROR] Resume Embedding failed for {', '.join(path for path, _ in batch)}: {e}")
+                    traceback.print_exc()
+                    for file_path, _ in batch:
+                        metrics.record_document("embedding", file_path, 0.0, "failed", bulk=len(batch))
+        except Exception as e:
+            error = e
+            self.fail("Resume Embedding", e)
+        finally:
+            self.stage_finished("Resume Embedding", error)
+            self.put(self.embedded, _DONE)
+
+    def embed_batch(self, batch):
+        start = time.perf_counter()
+        texts = []
+        metadatas = []
+        for file_path, parsed in batch:
+            doc_id = resume_embedding.sanitize_doc_id(os.path.basename(file_path))
+            doc_texts, doc_metadatas = resume_embedding.collect_field_texts(parsed, doc_id)
+            texts.extend(doc_texts)
+            metadatas.extend(doc_metadatas)
+        if not texts:
+            return
+
+        embeddings = resume_embedding.encode_texts(texts)
+        # Comparisons use the vectors and texts below; Chroma only gets a copy (CHROMA_PERSIST)
+        try:
+            chroma_sink.persist(resume_embedding.store_records, self.chroma_resume, texts, embeddings, metadatas)
+        except Exception as e:
+            print(f"[ERROR] Failed to store embeddings in '{self.chroma_resume}': {e}")
+        vectors = group_field_vectors(embeddings, metadatas)
+
+        elapsed = (time.perf_counter() - start) / len(batch)
+        for doc_id, fields in llm.group_field_documents(texts, metadatas).items():
+            entry = llm.build_document_entry(doc_id, fields)
+            metrics.record_document("embedding", doc_id, elapsed, "ok" if entry else "failed", bulk=len(batch))
+            if entry is not None and not self.put(self.embedded, (doc_id, entry, vectors.get(doc_id, {}))):
+                return
+
+    def prepare_jds(self):
+        """Extract and embed the JDs (records handed over in memory), then load them for the comparison stage."""
+        try:
+            self.stage_started("JD Extraction")
+            try:
+                records = process_jds(self.jd_folder, self.jd_json)
+            except Exception as e:
+                self.fail("JD Extraction", e)
+                self.stage_finished("JD Extraction", e)
+                return
+            self.stage_finished("JD Extraction")
+
+            self.stage_started("JD Embedding")
+            try:
+                jd_texts, jd_embeddings, jd_metadatas = jd_embedding.embed_records(records, self.chroma_jd)
+            except Exception as e:
+                self.fail("JD Embedding", e)
+                self.stage_finished("JD Embedding", e)
+                return
+            self.stage_finished("JD Embedding")
+
+            jd_docs = llm.group_field_documents(jd_texts, jd_metadatas)
+            self.jd_table = llm.build_document_table(jd_docs, list(jd_docs))
+            if self.top_k or self.threshold is not None:
+                self.jd_vectors = group_field_vectors(jd_embeddings, jd_metadatas)
+        finally:
+            self.jd_ready.set()
+
+    def dispatch_comparisons(self, executor):
+        groups = {}
+        buffered = {}
+        error = None
+        try:
+            while not self.jd_ready.wait(0.5):
+                if self.stop.is_set():
+                    return
+            if not self.jd_table:
+                raise ValueError("No job descriptions available to compare against")
+
+            while True:
+                item = self.get(self.embedded)
+                if item is _DONE:
+                    break
+                resume_id, resume, vectors = item
+                if self.top_k:
+                    buffered[resume_id] = (resume, vectors)
+                    continue
+                for jd_id, jd in self.jd_table.items():
+                    jd_vectors = self.jd_vectors.get(jd_id)
+                    if jd_vectors and self.threshold is not None \
+                            and weighted_similarity(jd_vectors, vectors) < self.threshold:
+                        continue
+                    self.queue_pair(executor, groups, llm.make_pair(resume_id, resume, jd_id, jd))
+
+            if buffered:
+                candidates = {resume_id: vectors for resume_id, (_, vectors) in buffered.items()}
+                for jd_id, jd in self.jd_table.items():
+                    selected = list(buffered)
+                    jd_vectors = self.jd_vectors.get(jd_id)
+                    if jd_vectors:
+                        ranked = shortlist(jd_vectors, candidates, top_k=self.top_k, threshold=self.threshold)
+                        selected = [name for name, _ in ranked]
+                        print(f"[INFO] Shortlisted {len(selected)}/{len(buffered)} resume(s) for '{jd_id}'")
+                    for resume_id in selected:
+                        self.queue_pair(executor, groups, llm.make_pair(resume_id, buffered[resume_id][0], jd_id, jd))
+
+            for group in groups.values():
+                if group:
+                    self.submit_group(executor, group)
+        except Exception as e:
+            error = e
+            self.fail("LLM-Based Comparison", e)
+        finally:
+            if error is not None:
+                self.stage_finished("LLM-Based Comparison", error)
+            with self._lock:
+                self.dispatch_done = True
+                finished = self.in_flight == 0
+            if finished:
+                self.results.put(_DONE)
+
+    def queue_pair(self, executor, groups, pair):
+        # Pairs are grouped per JD exactly as compare.llm.group_pairs does; full groups go out immediately
+        group = groups.setdefault(pair["jd_id"], [])
+        group.append(pair)
+        if len(group) >= self.group_size:
+            self.submit_group(executor, group)
+            groups[pair["jd_id"]] = []
+
+    def submit_group(self, executor, group):
+        with self._lock:
+            self.in_flight += 1
+        future = metrics.submit(executor, llm.compare_group, group)
+        future.add_done_callback(lambda f: self.group_finished(f, group))
+
+    def group_finished(self, future, group):
+        try:
+            for parsed in future.result():
+                self.results.put(parsed)
+        except Exception as e:
+            print(f"[ERROR] Comparison worker failed for {', '.join(p['name'] for p in group)}: {e}")
+        with self._lock:
+            self.in_flight -= 1
+            finished = self.dispatch_done and self.in_flight == 0
+        if finished:
+            self.results.put(_DONE)
+
+    def run(self):
+        """Generator of comparison results in completion order.
+
+        Raises RuntimeError after the last result if a stage failed, so callers see it as they do a failed step of main.run.
+        """
+        files = list_resume_files(self.resume_folder) or []
+        self.parser = LLMResumeParser()
+        self.persister = JsonPersister(self.parser, self.resume_json)
+        for folder in (self.jd_json, self.chroma_resume, self.chroma_jd):
+            os.makedirs(folder, exist_ok=True)
+        clear_json_folder(self.resume_json)
+        # Drops every resume stored by an earlier run of the same folder; queued ahead of this run's writes
+        chroma_sink.persist(resume_embedding.remove_documents_except, self.chroma_resume, set())
+
+        for name in ("Resume Extraction", "Resume Embedding", "LLM-Based Comparison"):
+            self.stage_started(name)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compare")
+        threads = [metrics.start_thread(self.read_texts, files, name="pipeline-text")]
+        threads += [metrics.start_thread(self.parse_resumes, name=f"pipeline-extract-{i}")
+                    for i in range(self.extraction_workers)]
+        threads.append(metrics.start_thread(self.embed_resumes, name="pipeline-embed"))
+        threads.append(metrics.start_thread(self.dispatch_comparisons, executor, name="pipeline-compare"))
+
+        count = 0
+        try:
+            self.prepare_jds()
+            while True:
+                item = self.results.get()
+                if item is _DONE:
+                    break
+                count += 1
+                yield item
+        finally:
+            # Unblocks every stage if the consumer stopped early; a no-op after a full run
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.persister.close()
+
+        if not any(name == "LLM-Based Comparison" for name, _ in self.errors):
+            self.stage_finished("LLM-Based Comparison")
+        print(f"\n[INFO] Overlapped pipeline produced {count} comparison(s)")
+        if self.errors:
+            failed = "; ".join(f"{name}: {error}" for name, error in self.errors)
+            raise RuntimeError(f"Pipeline stage(s) failed: {failed}")
@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+import traceback
+from dotenv import load_dotenv
+import metrics
+load_dotenv()
+
+# Load the heavy dependencies when the server starts instead of on the first request;
+# it runs in the background and GET /ready reports when it is done
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "1") == "1"
+
+def warm_embedding_model():
+    from embedding.model_registry import warm_up
+    warm_up()
+
+def warm_llm_client():
+    from inference import get_inference_client
+    get_inference_client(os.getenv("MODEL_NAME"))
+
+def warm_chroma():
+    # Per-run stores live in the upload folders, so an in-memory client is enough to load chromadb
+    import chromadb
+    chromadb.EphemeralClient().heartbeat()
+
+def warm_text_extraction():
+    import fitz  # PyMuPDF
+    import docx
+
+WARM_UP_STEPS = [
+    ("embedding_model", warm_embedding_model),
+    ("llm_client", warm_llm_client),
+    ("chroma", warm_chroma),
+    ("text_extraction", warm_text_extraction),
+]
+
+class WarmUp:
+    """Runs the warm-up steps once per worker and keeps each step's status for the readiness check.
+
+    A step is pending -> running -> done | failed, or skipped when warm-up is disabled.
+    The worker is ready once no step is pending, running or failed.
+    """
+
+    def __init__(self, steps=WARM_UP_STEPS):
+        self.steps = list(steps)
+        self._status = {name: {"status": "pending", "elapsed": None, "error": None} for name, _ in self.steps}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _set(self, name, status, elapsed=None, error=None):
+        with self._lock:
+            self._status[name] = {"status": status, "elapsed": elapsed, "error": error}
+
+    def run(self):
+        for name, func in self.steps:
+            self._set(name, "running")
+            start = time.time()
+            try:
+                func()
+                elapsed = round(time.time() - start, 4)
+                self._set(name, "done", elapsed)
+                print(f"[INFO] Warm-up step '{name}' done in {elapsed:.2f}s")
+            except Exception as e:
+                elapsed = round(time.time() - start, 4)
+                self._set(name, "failed", elapsed, str(e))
+                print(f"[ERROR] Warm-up step '{name}' failed: {e}")
+                traceback.print_exc()
+            metrics.observe("warm_up_seconds", elapsed, step=name)
+
+    def start(self):
+        """Run the steps on a background thread, so the server answers /health while warming up."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def skip(self):
+        for name, _ in self.steps:
+            self._set(name, "skipped")
+
+    def status(self):
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._status.items()}
+        ready = all(state["status"] in ("done", "skipped") for state in steps.values())
+        return {"ready": ready, "steps": steps}